@@ -1,26 +1,179 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.settings import settings
 
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver (aiosqlite / asyncpg)."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+}
+
+
+def sqlite_pragmas(query_only: bool = False) -> list[str]:
+    pragmas = [
+        f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT}",
+    ]
+    if query_only:
+        pragmas.append("PRAGMA query_only = ON")
+    return pragmas
+
+
+def configure_sqlite(engine, begin: str | None = None, query_only: bool = False):
+    """
+    Applies the SQLite pragmas to every new connection of a (sync) engine.
+
+    With begin, transactions are started with that statement instead of the
+    driver's lazy BEGIN, e.g. "BEGIN IMMEDIATE" to take the write lock up front
+    rather than failing to upgrade a read lock halfway through.
+    """
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas(query_only):
+            cursor.execute(pragma)
+        cursor.close()
+        if begin:
+            dbapi_connection.isolation_level = None  # BEGIN is emitted below
+
+    if begin:
+
+        @event.listens_for(engine, "begin")
+        def begin_transaction(conn):
+            conn.exec_driver_sql(begin)
+
+
+class RoutingSession(Session):
+    """
+    Sends flushes and INSERT/UPDATE/DELETE statements to the writer engine and
+    everything else to the reader engine. Once a transaction has written it
+    stays on the writer, so it reads its own writes.
+    """
+
+    def __init__(self, *args, reader, writer, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reader = reader
+        self.writer = writer
+        self.writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.writing or self._flushing or getattr(clause, "is_dml", False):
+            self.writing = True
+            return self.writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def release_writer(session, transaction):
+    if transaction.parent is None:
+        session.writing = False
+
+
+def create_sqlite_engines(url: str) -> tuple[AsyncEngine, AsyncEngine]:
+    """
+    (reader, writer) async engines for a SQLite database in WAL mode.
+
+    Readers never block on the writer in WAL, so they get a pool. SQLite only
+    has one write lock per database, so all of this process's writes go
+    through a single connection: they queue in the pool instead of retrying
+    against "database is locked".
+
+    The reader pool is capped at SQLITE_READERS without overflow. Every
+    statement of a write transaction waits for a turn of the event loop while
+    holding the write lock; with many readers busy on the same loop each turn
+    takes longer, so write throughput falls as reader concurrency grows.
+    """
+    url = async_database_url(url)
+    reader = create_async_engine(
+        url,
+        **{**pool_options, "pool_size": settings.SQLITE_READERS, "max_overflow": 0},
+    )
+    writer = create_async_engine(
+        url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    configure_sqlite(reader.sync_engine, query_only=True)
+    configure_sqlite(writer.sync_engine, begin="BEGIN IMMEDIATE")
+    return reader, writer
+
+
+# Request handlers and background jobs use the async engines. The sync engine
+# is kept for migrations and command line scripts.
+if is_sqlite(settings.DATABASE_URL):
+    async_engine, async_write_engine = create_sqlite_engines(settings.DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(
+        sync_session_class=RoutingSession,
+        reader=async_engine.sync_engine,
+        writer=async_write_engine.sync_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+else:
+    async_engine = async_write_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL), **pool_options
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args=(
-        {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+        {"check_same_thread": False} if is_sqlite(settings.DATABASE_URL) else {}
     ),
+    **pool_options,
 )
+if is_sqlite(settings.DATABASE_URL):
+    configure_sqlite(engine)
+
+# Every engine whose queries count towards X-Query-Count
+sync_engines = [engine, async_engine.sync_engine]
+if async_write_engine is not async_engine:
+    sync_engines.append(async_write_engine.sync_engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
-def init_db():
-    Base.metadata.create_all(bind=engine)  # Recreate with new schema
+async def dispose_engines():
+    await async_engine.dispose()
+    if async_write_engine is not async_engine:
+        await async_write_engine.dispose()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,16 +1,52 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from app.database import init_db
-from app.routes import auth_router, profile_router, roadmap_router
-from app.database import Base, engine, init_db
+from app.routes import auth_router, profile_router, roadmap_router, metrics_router
+from app.database import dispose_engines
 from app.settings import settings
+from app.utils.cache import purge_roadmap_cache
+from app.utils.github import github_exporter
+from app.utils.google import refresh_google_metadata, refresh_google_tokens
+from app.utils.jobs import job_workers
+from app.utils.jwt import password_hasher
+from app.utils.llm import llm_clients
+from app.utils.query_stats import count_queries
 
 
-init_db()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    llm_clients.startup()
+    password_hasher.startup()
+    await job_workers.start()
+    # In the background: startup doesn't wait for (or need) the network
+    google_metadata_refresh = asyncio.create_task(refresh_google_metadata())
+    google_token_refresher = asyncio.create_task(refresh_google_tokens())
+    roadmap_cache_purge = asyncio.create_task(purge_roadmap_cache())
+    yield
+    google_metadata_refresh.cancel()
+    google_token_refresher.cancel()
+    roadmap_cache_purge.cancel()
+    await job_workers.stop()
+    password_hasher.shutdown()
+    await llm_clients.shutdown()
+    github_exporter.close()
+    await dispose_engines()
+
+
+app = FastAPI(debug=True, lifespan=lifespan)
+
+
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    """Reports the number and total time of SQL queries issued by each request"""
+    with count_queries() as stats:
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(stats.count)
+    response.headers["X-Query-Time"] = f"{stats.duration * 1000:.1f}ms"
+    return response
 
-app = FastAPI(debug=settings.DEBUG)
-app = FastAPI(debug=True)
 
 app.add_middleware(
     SessionMiddleware,
@@ -30,3 +66,4 @@ app.add_middleware(
 app.include_router(auth_router, prefix=settings.PREFIX)
 app.include_router(profile_router, prefix=settings.PREFIX)
 app.include_router(roadmap_router, prefix=settings.PREFIX)
+app.include_router(metrics_router, prefix=settings.PREFIX)
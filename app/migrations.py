@@ -0,0 +1,470 @@
+"""
+Schema migrations and query-plan checks.
+
+Run once per deploy, not from app import:
+
+    python -m app.migrations upgrade       # apply pending migrations
+    python -m app.migrations current       # print the applied version
+    python -m app.migrations check-plans   # EXPLAIN the route queries
+
+Migrations are idempotent (they inspect before altering), because the first
+one creates any missing tables from the current models.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    JSON,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    inspect,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app.database import Base, engine
+from app.models import Job, Roadmap, RoadmapBlob, RoadmapCache, User
+from app.models.types import CompressedText
+from app.repositories import RoadmapRepository
+from app.repositories.blob import acquire_statement, blob_rows, content_hash
+from app.repositories.search import (
+    index_statement,
+    search_row,
+    search_statement,
+    search_table_ddl,
+    use_fts5,
+)
+from app.utils.roadmap_parser import parse_roadmap
+
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+# roadmaps as they were while content was stored inline, before migration 8
+# moved it to roadmap_blobs, for the migrations that read it
+legacy_roadmaps = Table(
+    "roadmaps",
+    MetaData(),  # Never created
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("title", String),
+    Column("content", CompressedText),
+    Column("content_size", Integer),
+    Column("structure", JSON),
+    Column("content_hash", String),
+)
+
+
+def add_column_if_missing(conn: Connection, table: str, column: str, ddl: str):
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def create_missing_indexes(conn: Connection):
+    # Indexes on tables or columns a later migration adds are left to it
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {c.name for c in index.columns} <= existing:
+                index.create(conn, checkfirst=True)
+
+
+def has_inline_content(conn: Connection) -> bool:
+    """Whether roadmaps still has its content column (migration 8 drops it)."""
+    return any(c["name"] == "content" for c in inspect(conn).get_columns("roadmaps"))
+
+
+def initial_schema(conn: Connection):
+    Base.metadata.create_all(conn)
+
+
+def roadmap_listing_indexes(conn: Connection):
+    add_column_if_missing(conn, "roadmaps", "content_size", "INTEGER")
+
+    if conn.dialect.name == "postgresql":
+        # Content columns became compressed bytea; keep existing text readable
+        for table in ("roadmaps", "roadmap_cache"):
+            column = next(
+                (c for c in inspect(conn).get_columns(table) if c["name"] == "content"),
+                None,
+            )
+            if column and column["type"].python_type is str:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table} ALTER COLUMN content TYPE bytea "
+                    "USING convert_to(content, 'UTF8')"
+                )
+
+    create_missing_indexes(conn)
+    if not has_inline_content(conn):
+        return  # Created after content moved to blobs, with sizes
+
+    # Backfill sizes for rows written before content_size existed
+    roadmaps = legacy_roadmaps
+    while True:
+        rows = conn.execute(
+            select(roadmaps.c.id, roadmaps.c.content)
+            .where(roadmaps.c.content_size.is_(None))
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute(
+                update(roadmaps)
+                .where(roadmaps.c.id == row.id)
+                .values(content_size=len(row.content or ""))
+            )
+
+
+def job_dedupe_and_progress(conn: Connection):
+    add_column_if_missing(conn, "jobs", "progress", "JSON")
+    add_column_if_missing(conn, "jobs", "dedupe_key", "VARCHAR")
+    create_missing_indexes(conn)
+
+
+def google_token_expiry(conn: Connection):
+    add_column_if_missing(conn, "users", "google_refresh_token", "VARCHAR")
+    add_column_if_missing(conn, "users", "google_token_expires_at", "TIMESTAMP")
+
+
+def roadmap_structure(conn: Connection):
+    add_column_if_missing(conn, "roadmaps", "structure", "JSON")
+    if not has_inline_content(conn):
+        return  # Created after content moved to blobs, with structures
+
+    # Parse the roadmaps stored before structure existed
+    roadmaps = legacy_roadmaps
+    while True:
+        rows = conn.execute(
+            select(roadmaps.c.id, roadmaps.c.content)
+            .where(roadmaps.c.structure.is_(None))
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute(
+                update(roadmaps)
+                .where(roadmaps.c.id == row.id)
+                .values(structure=parse_roadmap(row.content or ""))
+            )
+
+
+def roadmap_progress(conn: Connection):
+    blob = "BYTEA" if conn.dialect.name == "postgresql" else "BLOB"
+    add_column_if_missing(conn, "roadmaps", "progress", blob)
+
+
+def roadmap_search(conn: Connection):
+    for ddl in search_table_ddl(conn.dialect.name == "postgresql"):
+        conn.exec_driver_sql(ddl)
+
+    if not has_inline_content(conn):
+        return  # Created after content moved to blobs, and indexed
+
+    # Index the roadmaps stored before search existed
+    roadmaps = legacy_roadmaps
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(
+                roadmaps.c.id, roadmaps.c.user_id, roadmaps.c.title, roadmaps.c.content
+            )
+            .where(roadmaps.c.id > last_id)
+            .order_by(roadmaps.c.id)
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        conn.execute(index_statement(), [search_row(row) for row in rows])
+        last_id = rows[-1].id
+
+
+def roadmap_blobs(conn: Connection):
+    Base.metadata.create_all(conn)  # roadmap_blobs
+    add_column_if_missing(
+        conn, "roadmaps", "content_hash", "VARCHAR(64) REFERENCES roadmap_blobs (hash)"
+    )
+    create_missing_indexes(conn)
+    if not has_inline_content(conn):
+        return
+
+    # Move content into blobs, then drop the inline copies
+    roadmaps = legacy_roadmaps
+    while True:
+        rows = conn.execute(
+            select(roadmaps.c.id, roadmaps.c.content)
+            .where(roadmaps.c.content_hash.is_(None))
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        contents = [row.content or "" for row in rows]
+        conn.execute(acquire_statement(), blob_rows(contents))
+        for row, content in zip(rows, contents):
+            conn.execute(
+                update(roadmaps)
+                .where(roadmaps.c.id == row.id)
+                .values(content_hash=content_hash(content))
+            )
+    conn.exec_driver_sql("ALTER TABLE roadmaps DROP COLUMN content")
+
+
+def roadmap_search_storage(conn: Connection):
+    # Indexes built by migration 7 kept a copy of every roadmap's text
+    conn.exec_driver_sql("DROP TABLE IF EXISTS roadmap_search")
+    for ddl in search_table_ddl(conn.dialect.name == "postgresql"):
+        conn.exec_driver_sql(ddl)
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(Roadmap.id, Roadmap.user_id, Roadmap.title, RoadmapBlob.content)
+            .join(RoadmapBlob, RoadmapBlob.hash == Roadmap.content_hash)
+            .where(Roadmap.id > last_id)
+            .order_by(Roadmap.id)
+            .limit(500)
+        ).all()
+        if not rows:
+            break
+        conn.execute(index_statement(), [search_row(row) for row in rows])
+        last_id = rows[-1].id
+
+
+# (version, name, function). Append only; never renumber.
+MIGRATIONS = [
+    (1, "initial schema", initial_schema),
+    (2, "roadmap listing indexes", roadmap_listing_indexes),
+    (3, "job dedupe keys and progress", job_dedupe_and_progress),
+    (4, "google token expiry", google_token_expiry),
+    (5, "roadmap structure", roadmap_structure),
+    (6, "roadmap progress", roadmap_progress),
+    (7, "roadmap search", roadmap_search),
+    (8, "roadmap content blobs", roadmap_blobs),
+    (9, "roadmap search storage", roadmap_search_storage),
+]
+
+
+def current_version(conn: Connection) -> int:
+    migration_metadata.create_all(conn)
+    return conn.execute(select(func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def upgrade(bind=None):
+    """
+    Applies pending migrations, each in its own transaction, to the app's
+    database or to the (sync) engine bind.
+    """
+    bind = bind or engine
+    with bind.begin() as conn:
+        version = current_version(conn)
+
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with bind.begin() as conn:
+            print(f"Applying migration {number}: {name}")
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=number, name=name))
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN wrapper that compiles (and binds) the wrapped statement normally."""
+
+    inherit_cache = False
+    # Read by the compiler when the wrapped statement is an INSERT or UPDATE
+    _inline = False
+    _return_defaults = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "sqlite")
+def compile_explain_sqlite(element, compiler, **kw):
+    return "EXPLAIN QUERY PLAN " + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, "postgresql")
+def compile_explain_postgresql(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def explain(conn: Connection, statement) -> list:
+    # Raw DB-API rows: the plan doesn't have the wrapped statement's columns,
+    # so SQLAlchemy's result processing for them must not run.
+    result = conn.execute(Explain(statement))
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+
+def route_queries():
+    """
+    The hot queries issued by the routes (built by the same code where
+    possible), with the table each one must not
+    scan and the index it is expected to use.
+    """
+    now = datetime.utcnow()
+    return [
+        (
+            "roadmap listing page",
+            RoadmapRepository.page_statement(1, 21),
+            "roadmaps",
+            "ix_roadmaps_user_id_created_at",
+        ),
+        (
+            "roadmap listing page after cursor",
+            RoadmapRepository.page_statement(1, 21, after=(now, 100)),
+            "roadmaps",
+            "ix_roadmaps_user_id_created_at",
+        ),
+        (
+            "owned roadmap",
+            RoadmapRepository.owned_statement(1, 1, include_content=True),
+            "roadmaps",
+            None,
+        ),
+        (
+            "owned roadmap progress update",
+            RoadmapRepository.progress_statement(1, 1, None, b"\x01"),
+            "roadmaps",
+            None,
+        ),
+        (
+            "owned roadmap delete",
+            delete(Roadmap).where(Roadmap.id == 1, Roadmap.user_id == 1),
+            "roadmaps",
+            None,
+        ),
+        (
+            "roadmap search",
+            search_statement(1, "python basics", 21),
+            "roadmap_search",
+            (
+                "VIRTUAL TABLE INDEX 0:M"
+                if use_fts5
+                else "ix_roadmap_search_user_id_document"
+            ),
+        ),
+        (
+            "user by email",
+            select(User.id).where(User.email == "someone@example.com"),
+            "users",
+            "ix_users_email",
+        ),
+        (
+            "generation cache lookup",
+            select(RoadmapCache.content).where(
+                RoadmapCache.key == "0" * 64, RoadmapCache.expires_at > now
+            ),
+            "roadmap_cache",
+            None,
+        ),
+        (
+            "due jobs",
+            select(Job.id)
+            .where(Job.status.in_(["queued", "running"]), Job.visible_at <= now)
+            .order_by(Job.visible_at)
+            .limit(5),
+            "jobs",
+            "ix_jobs_status_visible_at",
+        ),
+    ]
+
+
+def plan_problems_sqlite(conn: Connection, statement, table: str, index: str | None):
+    details = [row[3] for row in explain(conn, statement)]
+    problems = [f"full scan: {d}" for d in details if d == f"SCAN {table}"]
+    if index and not any(index in d for d in details):
+        problems.append(f"{index} not used: {details}")
+    return problems
+
+
+def plan_problems_postgresql(
+    conn: Connection, statement, table: str, index: str | None
+):
+    # Tiny tables make a seq scan the cheapest plan; we want to know whether
+    # an index *can* serve the query, so take seq scans off the table.
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = explain(conn, statement)[0][0][0]["Plan"]
+
+    nodes = [plan]
+    problems = []
+    used_indexes = set()
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") == table:
+            problems.append(f"full scan of {table}")
+        if "Index Name" in node:
+            used_indexes.add(node["Index Name"])
+    if index and index not in used_indexes:
+        problems.append(f"{index} not used: {sorted(used_indexes)}")
+    return problems
+
+
+def check_plans() -> bool:
+    """EXPLAINs every route query and reports scans and unused indexes."""
+    checkers = {
+        "sqlite": plan_problems_sqlite,
+        "postgresql": plan_problems_postgresql,
+    }
+    checker = checkers.get(engine.dialect.name)
+    if not checker:
+        print(f"No plan check for {engine.dialect.name}")
+        return True
+
+    ok = True
+    with engine.connect() as conn:
+        for name, statement, table, index in route_queries():
+            with conn.begin():
+                problems = checker(conn, statement, table, index)
+            print(f"{'FAIL' if problems else 'ok'}: {name}")
+            for problem in problems:
+                print(f"    {problem}")
+            ok = ok and not problems
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.migrations")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["upgrade", "current", "check-plans"],
+        default="upgrade",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        upgrade()
+    elif args.command == "current":
+        with engine.begin() as conn:
+            print(current_version(conn))
+    elif args.command == "check-plans":
+        return 0 if check_plans() else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from .models import User, Roadmap
+from .models import User, Roadmap, RoadmapBlob, RoadmapCache, Job
 from .schema import (
     Token,
     PasswordUpdate,
@@ -8,4 +8,10 @@ from .schema import (
     GenerateRoadmapSchema,
     UserResponse,
     RoadmapResponseSchema,
+    RoadmapSummarySchema,
+    RoadmapPageSchema,
+    RoadmapSearchResultSchema,
+    RoadmapSearchPageSchema,
+    ProgressUpdateSchema,
+    JobResponseSchema,
 )
@@ -7,11 +7,17 @@ from sqlalchemy import (
     UUID,
     func,
     DateTime,
+    JSON,
+    Index,
+    LargeBinary,
+    select,
 )
 from app.settings import settings
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base, engine
+from app.models.types import CompressedText
 import uuid
+from datetime import datetime
 
 
 class User(Base):
@@ -25,6 +31,8 @@ class User(Base):
     avatar_url = Column(String, nullable=True)
     hashed_password = Column(String, nullable=True)  # Store hashed password
     google_oauth_token = Column(String, unique=True, index=True, nullable=True)
+    google_refresh_token = Column(String, nullable=True)
+    google_token_expires_at = Column(DateTime, nullable=True)  # UTC
     github_token = Column(String, unique=True, index=True, nullable=True)
     created_at = Column(DateTime, server_default=func.now())  # Auto-set on insert
     updated_at = Column(
@@ -36,15 +44,84 @@ class User(Base):
     )
 
 
+class RoadmapBlob(Base):
+    """Roadmap content, stored once per distinct text and shared by reference."""
+
+    __tablename__ = "roadmap_blobs"
+    hash = Column(String(64), primary_key=True)  # sha256 of the content
+    content = Column(CompressedText, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # Roadmaps pointing here
+    created_at = Column(DateTime, server_default=func.now())  # Auto-set on insert
+
+
 class Roadmap(Base):
     __tablename__ = "roadmaps"
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, index=True)
     title = Column(String, nullable=True)
-    content = Column(String, nullable=False)
+    # Set through RoadmapRepository, which keeps the blob's ref_count
+    content_hash = Column(
+        String(64), ForeignKey("roadmap_blobs.hash"), nullable=True, index=True
+    )
+    # The blob's text, only loaded when accessed or undefer()-ed in the query
+    content = deferred(
+        select(RoadmapBlob.content)
+        .where(RoadmapBlob.hash == content_hash)
+        .scalar_subquery()
+    )
+    content_size = Column(Integer, nullable=True)  # Uncompressed length, for listings
+    # Parsed title/modules/topics (app.utils.roadmap_parser), set on insert
+    structure = Column(JSON, nullable=True)
+    # Done topics as a bitset over structure's topics (app.utils.progress)
+    progress = Column(LargeBinary, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     created_at = Column(DateTime, server_default=func.now())  # Auto-set on insert
     updated_at = Column(
         DateTime, server_default=func.now(), onupdate=func.now()
     )  # Auto-update on changes
     user = relationship("User", back_populates="roadmaps")
+
+    __table_args__ = (
+        # A user's roadmaps by recency (listing, keyset cursor) and ownership checks
+        Index("ix_roadmaps_user_id_created_at", "user_id", "created_at", "id"),
+    )
+
+
+class RoadmapCache(Base):
+    __tablename__ = "roadmap_cache"
+    key = Column(String(64), primary_key=True)  # sha256 of the normalized request
+    model = Column(String, nullable=True)
+    content = Column(CompressedText, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now())  # Auto-set on insert
+
+
+class Job(Base):
+    """Background work such as a roadmap generation. The queue's source of truth."""
+
+    __tablename__ = "jobs"
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    progress = Column(JSON, nullable=True)  # Handler-reported, e.g. the current step
+    # Set while the job is unfinished; a duplicate request gets the same job
+    dedupe_key = Column(String, nullable=True)
+    visible_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )  # Not claimable before this time
+    created_at = Column(DateTime, server_default=func.now())  # Auto-set on insert
+    updated_at = Column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )  # Auto-update on changes
+
+    __table_args__ = (
+        Index("ix_jobs_status_visible_at", "status", "visible_at"),
+        Index("ix_jobs_dedupe_key", "dedupe_key", unique=True),
+    )
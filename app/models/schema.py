@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Optional
 from uuid import UUID
+from datetime import datetime
 
 
 class Token(BaseModel):
@@ -39,12 +40,63 @@ class PasswordUpdate(BaseModel):
 class GenerateRoadmapSchema(BaseModel):
     topic: str
     level: str
+    bypass_cache: bool = False  # Always call the LLM and refresh the cached result
 
 
 class RoadmapResponseSchema(BaseModel):
     id: int
     title: str
     content: str
+    structure: dict[str, Any] | None = None  # Only with ?include=structure
+
+    class Config:
+        from_attributes = True
+
+
+class ProgressUpdateSchema(BaseModel):
+    topics: dict[str, bool]  # Topic id (as in structure) -> done
+
+
+class RoadmapSummarySchema(BaseModel):
+    id: int
+    title: str | None = None
+    created_at: datetime | None = None
+    size: int | None = None
+    content: str | None = None  # Only with ?include=content
+
+    class Config:
+        from_attributes = True
+
+
+class RoadmapPageSchema(BaseModel):
+    roadmaps: list[RoadmapSummarySchema]
+    next_cursor: str | None = None
+
+
+class RoadmapSearchResultSchema(BaseModel):
+    id: int
+    title: str | None = None  # Escaped HTML, matches wrapped in <mark></mark>
+    snippet: str | None = None
+    created_at: datetime | None = None
+    score: float  # Higher is a better match
+
+    class Config:
+        from_attributes = True
+
+
+class RoadmapSearchPageSchema(BaseModel):
+    results: list[RoadmapSearchResultSchema]
+    next_offset: int | None = None
+
+
+class JobResponseSchema(BaseModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    progress: dict[str, Any] | None = None
 
     class Config:
         from_attributes = True
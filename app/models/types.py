@@ -0,0 +1,60 @@
+import zlib
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Preset dictionary for zlib. Generated roadmaps are short and repeat the same
+# scaffolding and vocabulary, so priming the compression window with it saves
+# most of what a plain deflate stream can't find on its own. zlib prefers
+# matches near the end of the dictionary, so the most common fragments go last.
+# Never edit it in place: stored rows need the exact bytes they were written
+# with. Add a new dictionary and format byte instead.
+ROADMAP_ZDICT_V1 = (
+    "Prerequisites Resources Exercises Capstone Case Study Real-world Tools "
+    "Libraries Frameworks Environment Setup Installation Configuration "
+    "Debugging Troubleshooting Optimization Scalability Monitoring Logging "
+    "Security Authentication Authorization Deployment Continuous Integration "
+    "Version Control Documentation Design Patterns Architecture Algorithms "
+    "Data Structures Functions Classes Objects Variables Types Syntax "
+    "Error Handling Testing Unit Tests Performance Best Practices "
+    "Core Concepts Key Concepts Overview Basics Fundamentals of "
+    "Advanced Intermediate Beginner Hands-on Project Building a "
+    "Understanding the Working with Introduction to Getting Started with "
+    "**Course Title**\n**Module 1: **\n**Module 2: **\n**Module 3: **\n"
+    "# Course Title\n\n- ## Module 1: \n- ## Module 2: \n- ## Module 3: \n"
+    "- ## Module 4: \n- ## Module 5: \n- ## Module 6: \n"
+    "    - [ ] Introduction to \n    - [ ] Understanding \n"
+    "    - [ ] Working with \n    - [ ] Best Practices\n"
+    "\n- ## Module \n    - [ ] \n    - [ ] \n    - [ ] "
+).encode()
+
+FORMAT_ZLIB_V1 = b"\x01"  # zlib stream compressed with ROADMAP_ZDICT_V1
+
+
+def compress_text(value: str) -> bytes:
+    compressor = zlib.compressobj(level=9, zdict=ROADMAP_ZDICT_V1)
+    return FORMAT_ZLIB_V1 + compressor.compress(value.encode()) + compressor.flush()
+
+
+def decompress_text(value: bytes | str) -> str:
+    if isinstance(value, str):
+        return value  # Row written before compression (SQLite TEXT)
+    if value[:1] == FORMAT_ZLIB_V1:
+        decompressor = zlib.decompressobj(zdict=ROADMAP_ZDICT_V1)
+        return (decompressor.decompress(value[1:]) + decompressor.flush()).decode()
+    return bytes(value).decode()  # Uncompressed text converted to a binary column
+
+
+class CompressedText(TypeDecorator):
+    """Text stored compressed in a binary column, transparently on write and read."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
@@ -0,0 +1,3 @@
+from .blob import RoadmapBlobRepository
+from .roadmap import RoadmapRepository
+from .search import RoadmapSearchRepository
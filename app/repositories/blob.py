@@ -0,0 +1,65 @@
+import hashlib
+from sqlalchemy import delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import is_sqlite
+from app.models import RoadmapBlob
+from app.settings import settings
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def blob_rows(contents: list[str]) -> list[dict]:
+    """One row per distinct content, counting how often it occurs in contents."""
+    rows = {}
+    for content in contents:
+        key = content_hash(content)
+        if key in rows:
+            rows[key]["ref_count"] += 1
+        else:
+            rows[key] = {"hash": key, "content": content, "ref_count": 1}
+    return list(rows.values())
+
+
+def acquire_statement():
+    """Inserts blobs, or adds to the ref_count of the ones already stored."""
+    dialect = sqlite if is_sqlite(settings.DATABASE_URL) else postgresql
+    statement = dialect.insert(RoadmapBlob)
+    return statement.on_conflict_do_update(
+        index_elements=[RoadmapBlob.hash],
+        set_={"ref_count": RoadmapBlob.ref_count + statement.excluded.ref_count},
+    )
+
+
+class RoadmapBlobRepository:
+    """
+    Roadmap content is content-addressed: identical roadmaps (the same cached
+    generation saved by many users) share one roadmap_blobs row, which counts
+    the roadmaps referencing it and goes when the last one does.
+
+    Writes are flushed but not committed; the caller owns the transaction.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def acquire(self, contents: list[str]) -> list[str]:
+        """Stores (or references) each content; returns their hashes, in order."""
+        if contents:
+            await self.db.execute(acquire_statement(), blob_rows(contents))
+        return [content_hash(content) for content in contents]
+
+    async def release(self, key: str):
+        """Drops one reference to a blob, and the blob with its last one."""
+        await self.db.execute(
+            update(RoadmapBlob)
+            .where(RoadmapBlob.hash == key)
+            .values(ref_count=RoadmapBlob.ref_count - 1)
+        )
+        await self.db.execute(
+            delete(RoadmapBlob).where(
+                RoadmapBlob.hash == key, RoadmapBlob.ref_count <= 0
+            )
+        )
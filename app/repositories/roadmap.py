@@ -0,0 +1,221 @@
+import base64
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import Roadmap
+from app.repositories.blob import RoadmapBlobRepository
+from app.repositories.search import RoadmapSearchRepository
+from app.settings import settings
+from app.utils.progress import set_bits, topic_positions
+from app.utils.roadmap_parser import parse_roadmap
+
+
+def encode_cursor(created_at: datetime, roadmap_id: int) -> str:
+    """Opaque keyset cursor pointing just after the given roadmap."""
+    raw = f"{created_at.isoformat()}|{roadmap_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, roadmap_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(roadmap_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+class RoadmapRepository:
+    """
+    All roadmap queries go through here. Every lookup is scoped to its owner in
+    a single statement served by the primary key or
+    ix_roadmaps_user_id_created_at.
+
+    Writes are flushed but not committed; the caller owns the transaction.
+    Roadmaps are parsed into their structure here, once, as they are stored,
+    and added to (and removed from) the search index alongside. Content goes
+    in a shared, reference-counted blob (RoadmapBlobRepository).
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def owned_statement(roadmap_id: int, user_id: int, include_content: bool = False):
+        statement = select(Roadmap).where(
+            Roadmap.id == roadmap_id, Roadmap.user_id == user_id
+        )
+        if include_content:
+            statement = statement.options(undefer(Roadmap.content))
+        return statement
+
+    @staticmethod
+    def progress_statement(
+        roadmap_id: int, user_id: int, old: bytes | None, new: bytes
+    ):
+        """Sets the progress bitset, if it is still old."""
+        return (
+            update(Roadmap)
+            .where(
+                Roadmap.id == roadmap_id,
+                Roadmap.user_id == user_id,
+                Roadmap.progress.is_not_distinct_from(old),
+            )
+            .values(progress=new)
+        )
+
+    @staticmethod
+    def page_statement(
+        user_id: int,
+        limit: int,
+        after: tuple[datetime, int] | None = None,
+        include_content: bool = False,
+    ):
+        columns = [
+            Roadmap.id,
+            Roadmap.title,
+            Roadmap.created_at,
+            Roadmap.content_size.label("size"),
+        ]
+        if include_content:
+            columns.append(Roadmap.content)
+
+        statement = select(*columns).where(Roadmap.user_id == user_id)
+        if after:
+            created_at, roadmap_id = after
+            statement = statement.where(
+                or_(
+                    Roadmap.created_at < created_at,
+                    and_(Roadmap.created_at == created_at, Roadmap.id < roadmap_id),
+                )
+            )
+        return statement.order_by(Roadmap.created_at.desc(), Roadmap.id.desc()).limit(
+            limit
+        )
+
+    async def get_for_user(
+        self, roadmap_id: int, user_id: int, include_content: bool = False
+    ) -> Roadmap | None:
+        result = await self.db.scalars(
+            self.owned_statement(roadmap_id, user_id, include_content)
+        )
+        return result.first()
+
+    async def list_for_user(
+        self,
+        user_id: int,
+        limit: int = settings.ROADMAP_PAGE_SIZE,
+        cursor: str | None = None,
+        include_content: bool = False,
+    ):
+        """
+        One page of a user's roadmaps, newest first. Returns (rows, next_cursor).
+
+        Keyset pagination on (created_at, id): each page is a single index range
+        scan however deep the user pages. Only summary columns are selected
+        unless include_content is set.
+        """
+        after = decode_cursor(cursor) if cursor else None
+        # One extra row tells us whether there is a next page
+        result = await self.db.execute(
+            self.page_statement(user_id, limit + 1, after, include_content)
+        )
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return rows, next_cursor
+
+    async def create(self, user_id: int, title: str, content: str) -> Roadmap:
+        (roadmap,) = await self.create_many(user_id, [(title, content)])
+        return roadmap
+
+    async def create_many(
+        self, user_id: int, items: list[tuple[str, str]]
+    ) -> list[Roadmap]:
+        """
+        Inserts roadmaps from (title, content) pairs, with one batched INSERT
+        per table.
+        """
+        hashes = await RoadmapBlobRepository(self.db).acquire(
+            [content for _, content in items]
+        )
+        roadmaps = [
+            Roadmap(
+                title=title,
+                content_hash=content_hash,
+                content_size=len(content),
+                user_id=user_id,
+                structure=parse_roadmap(content),
+            )
+            for (title, content), content_hash in zip(items, hashes)
+        ]
+        self.db.add_all(roadmaps)
+        await self.db.flush()
+        # Already known, so reading it needn't query the blob
+        for roadmap, (_, content) in zip(roadmaps, items):
+            set_committed_value(roadmap, "content", content)
+        await RoadmapSearchRepository(self.db).index(roadmaps)
+        return roadmaps
+
+    async def update_progress(
+        self, roadmap_id: int, user_id: int, topics: dict[str, bool]
+    ) -> tuple[bytes, int] | None:
+        """
+        Marks topics (by id) done or not done. Returns (bitset, topic count), or
+        None if the user has no such roadmap.
+
+        The new bitset is written with one compare-and-set UPDATE, so concurrent
+        toggles of other topics are retried on top of each other rather than
+        lost. Content is never read or rewritten.
+        """
+        owned = (Roadmap.id == roadmap_id, Roadmap.user_id == user_id)
+        for _ in range(settings.ROADMAP_PROGRESS_RETRIES):
+            result = await self.db.execute(
+                select(Roadmap.structure, Roadmap.progress).where(*owned)
+            )
+            row = result.first()
+            if row is None:
+                return None
+
+            positions = topic_positions(row.structure)
+            unknown = topics.keys() - positions.keys()
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown topics: {', '.join(sorted(unknown))}",
+                )
+            size = row.structure["topic_count"]
+            changes = {positions[topic]: done for topic, done in topics.items()}
+            progress = set_bits(row.progress, changes, size)
+            if progress == row.progress:
+                return progress, size
+
+            result = await self.db.execute(
+                self.progress_statement(roadmap_id, user_id, row.progress, progress)
+            )
+            if result.rowcount:
+                return progress, size
+
+        raise HTTPException(
+            status_code=409, detail="Progress is being updated, try again"
+        )
+
+    async def delete_for_user(self, roadmap_id: int, user_id: int) -> bool:
+        result = await self.db.execute(
+            delete(Roadmap)
+            .where(Roadmap.id == roadmap_id, Roadmap.user_id == user_id)
+            .returning(Roadmap.id, Roadmap.user_id, Roadmap.title, Roadmap.content_hash)
+        )
+        deleted = result.first()
+        if deleted is None:
+            return False
+        await RoadmapSearchRepository(self.db).remove(deleted)
+        if deleted.content_hash:
+            await RoadmapBlobRepository(self.db).release(deleted.content_hash)
+        return True
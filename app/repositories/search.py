@@ -0,0 +1,269 @@
+"""
+Full-text search over a user's roadmaps.
+
+The index is its own table, roadmap_search, created by migration 7 (and
+rebuilt in this shape by migration 9) for the database in use, so it is not in
+Base.metadata. It keeps no copy of the text, only what finds and ranks matches:
+
+- SQLite: a contentless FTS5 table with porter stemming whose rowid is the
+  roadmap id. The owner is indexed as a "u<user id>" token, so a search
+  intersects the user's postings instead of filtering everyone's matches.
+  A row is removed with the values it was indexed with, read back from the
+  roadmap and its blob.
+- Postgres: a tsvector (title weighted A, body B) under a GIN index on
+  (user_id, document) (btree_gin), with websearch_to_tsquery syntax.
+
+Roadmap text lives once, compressed, in roadmap_blobs; the highlighted titles
+and snippets of a page of results are built from it here.
+"""
+
+import html
+import re
+from bisect import bisect_left
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR, to_tsvector, websearch_to_tsquery
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import is_sqlite
+from app.models import Roadmap, RoadmapBlob
+from app.settings import settings
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SEARCH_TERM = re.compile(r"\w+")
+# Tried in order, at most one is stripped; see stem()
+SUFFIXES = ("ations", "ation", "ings", "ing", "edly", "ed", "es", "s", "ly", "y")
+
+use_fts5 = is_sqlite(settings.DATABASE_URL)
+
+if use_fts5:
+    roadmap_search = Table(
+        "roadmap_search",
+        MetaData(),
+        Column("rowid", Integer, primary_key=True, key="roadmap_id"),
+        # The hidden column named after the table takes FTS5 commands
+        Column("roadmap_search", String, key="command"),
+        Column("owner", String),
+        Column("title", String),
+        Column("body", Text),
+    )
+else:
+    roadmap_search = Table(
+        "roadmap_search",
+        MetaData(),
+        Column("roadmap_id", Integer, primary_key=True),
+        Column("user_id", Integer),
+        Column("document", TSVECTOR),
+    )
+
+
+def search_table_ddl(postgres: bool) -> list[str]:
+    if not postgres:
+        return [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS roadmap_search USING fts5("
+            "owner, title, body, content = '', tokenize = 'porter unicode61')"
+        ]
+    return [
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+        "CREATE TABLE IF NOT EXISTS roadmap_search ("
+        " roadmap_id INTEGER PRIMARY KEY"
+        " REFERENCES roadmaps (id) ON DELETE CASCADE,"
+        " user_id INTEGER,"
+        " document TSVECTOR NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_roadmap_search_user_id_document"
+        " ON roadmap_search USING GIN (user_id, document)",
+    ]
+
+
+def search_row(roadmap, content: str | None = None) -> dict:
+    """
+    The values a roadmap (or any row with its columns) is indexed with, for
+    index_statement(). content, if given, stands in for roadmap.content.
+    """
+    row = {
+        "roadmap_id": roadmap.id,
+        "title": roadmap.title or "",
+        "body": (roadmap.content if content is None else content) or "",
+    }
+    if use_fts5:
+        row["owner"] = f"u{roadmap.user_id}"
+    else:
+        row["user_id"] = roadmap.user_id
+    return row
+
+
+def index_statement():
+    if use_fts5:
+        return insert(roadmap_search)
+    # Only the tsvector is stored; title and body are just its inputs
+    config = settings.ROADMAP_SEARCH_LANGUAGE
+    title = func.setweight(to_tsvector(config, bindparam("title")), "A")
+    body = func.setweight(to_tsvector(config, bindparam("body")), "B")
+    return insert(roadmap_search).values(
+        document=title.op("||", return_type=TSVECTOR)(body)
+    )
+
+
+def remove_statement(roadmap, content: str | None):
+    """Removes a roadmap indexed with content (see search_row)."""
+    if not use_fts5:
+        return delete(roadmap_search).where(roadmap_search.c.roadmap_id == roadmap.id)
+    # A contentless table can't look up what to remove, it's told
+    return insert(roadmap_search).values(
+        command="delete", **search_row(roadmap, content or "")
+    )
+
+
+def search_statement(user_id: int, query: str, limit: int, offset: int = 0):
+    """Ranked matches for the user's roadmaps, with their text, best first."""
+    if use_fts5:
+        table = literal_column("roadmap_search")
+        phrases = " ".join(f'"{term}"' for term in SEARCH_TERM.findall(query))
+        match = f'owner:"u{user_id}" AND {{title body}}: ({phrases})'
+        rank = func.bm25(table, 0.0, 10.0, 1.0)  # Lower is better
+        score = -rank
+        matches = table.match(match)
+        order = rank
+    else:
+        tsquery = websearch_to_tsquery(settings.ROADMAP_SEARCH_LANGUAGE, query)
+        score = func.ts_rank_cd(roadmap_search.c.document, tsquery)
+        matches = (roadmap_search.c.user_id == user_id) & roadmap_search.c.document.op(
+            "@@"
+        )(tsquery)
+        order = score.desc()
+
+    return (
+        select(
+            roadmap_search.c.roadmap_id.label("id"),
+            Roadmap.title,
+            Roadmap.content,
+            Roadmap.created_at,
+            score.label("score"),
+        )
+        .join(Roadmap, Roadmap.id == roadmap_search.c.roadmap_id)
+        .where(matches, Roadmap.user_id == user_id)
+        .order_by(order, roadmap_search.c.roadmap_id.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+def stem(word: str) -> str:
+    """
+    A rough English stem (running, runs -> run), close enough to the index's
+    stemming to find the words a match was made on.
+    """
+    word = word.lower()
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[: -len(suffix)]
+            break
+    if len(word) > 3 and word[-1] == word[-2]:
+        word = word[:-1]
+    return word
+
+
+def highlight(text: str, stems: set[str], start: int = 0, end: int | None = None):
+    """text[start:end] as HTML: escaped, with the words matching stems in <mark>."""
+    end = len(text) if end is None else end
+    out = []
+    for word in SEARCH_TERM.finditer(text, start, end):
+        if stem(word[0]) in stems:
+            out.append(html.escape(text[start : word.start()]))
+            out.append(f"{HIGHLIGHT_START}{html.escape(word[0])}{HIGHLIGHT_END}")
+            start = word.end()
+    out.append(html.escape(text[start:end]))
+    return "".join(out)
+
+
+def snippet(text: str, stems: set[str], size: int) -> str:
+    """About size words of text around its most matches, highlighted."""
+    words = list(SEARCH_TERM.finditer(text))
+    hits = [i for i, word in enumerate(words) if stem(word[0]) in stems]
+    first = 0
+    if hits:
+        # The size words from some hit on that hold the most hits, started early
+        best = max(
+            range(len(hits)), key=lambda h: bisect_left(hits, hits[h] + size) - h
+        )
+        first = max(0, hits[best] - size // 4)
+    last = min(len(words), first + size)
+
+    start = words[first].start() if first else 0
+    end = words[last - 1].end() if last < len(words) else len(text)
+    return (
+        ("…" if start else "")
+        + highlight(text, stems, start, end)
+        + ("…" if end < len(text) else "")
+    )
+
+
+class RoadmapSearchRepository:
+    """
+    Keeps roadmap_search in step with the roadmaps table and queries it.
+    Like RoadmapRepository, writes are flushed with the caller's transaction.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def index(self, roadmaps: list):
+        if roadmaps:
+            await self.db.execute(
+                index_statement(), [search_row(roadmap) for roadmap in roadmaps]
+            )
+
+    async def remove(self, roadmap):
+        """
+        Drops a deleted roadmap (a row with id, user_id, title and content_hash)
+        from the index. Call before releasing its blob.
+        """
+        content = None
+        if use_fts5:
+            content = await self.db.scalar(
+                select(RoadmapBlob.content).where(
+                    RoadmapBlob.hash == roadmap.content_hash
+                )
+            )
+        await self.db.execute(remove_statement(roadmap, content))
+
+    async def search(self, user_id: int, query: str, limit: int, offset: int = 0):
+        """One page of matches. Returns (results, next_offset)."""
+        if not SEARCH_TERM.search(query):
+            return [], None
+        # One extra row tells us whether there is a next page
+        result = await self.db.execute(
+            search_statement(user_id, query, limit + 1, offset)
+        )
+        rows = result.all()
+
+        next_offset = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_offset = offset + limit
+
+        stems = {stem(term) for term in SEARCH_TERM.findall(query)}
+        words = settings.ROADMAP_SEARCH_SNIPPET_WORDS
+        results = [
+            {
+                "id": row.id,
+                "title": highlight(row.title, stems) if row.title else row.title,
+                "snippet": snippet(row.content or "", stems, words),
+                "created_at": row.created_at,
+                "score": row.score,
+            }
+            for row in rows
+        ]
+        return results, next_offset
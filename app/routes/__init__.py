@@ -1,3 +1,4 @@
 from .auth import router as auth_router
 from .roadmap import router as roadmap_router
-from .profile import router as profile_router
\ No newline at end of file
+from .profile import router as profile_router
+from .metrics import router as metrics_router
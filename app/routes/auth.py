@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
 from app.settings import settings
 from app.models import User
-from app.utils.google import oauth
+from app.utils.github import github_exporter
+from app.utils.google import forget_google_token, from_timestamp, get_google_client
 from app.utils.jwt import (
     create_access_token,
     get_password_hash,
@@ -14,10 +15,11 @@ from app.utils.user import (
     authenticate_user,
     get_current_user,
     get_user,
+    invalidate_user,
 )
-import requests
+import httpx
+import time
 from datetime import datetime, timezone
-from authlib.integrations.starlette_client import OAuth
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -35,7 +37,7 @@ def github_login():
 
 
 @router.get("/github/callback")
-def github_callback(code: str, db: Session = Depends(get_db)):
+async def github_callback(code: str, db: AsyncSession = Depends(get_db)):
     url = "https://github.com/login/oauth/access_token"
     params = {
         "client_id": settings.GITHUB_CLIENT_ID,
@@ -45,17 +47,28 @@ def github_callback(code: str, db: Session = Depends(get_db)):
     }
     headers = {"Accept": "application/json"}
 
-    response = requests.post(url, params=params, headers=headers)
-    access_token = response.json().get("access_token")
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, params=params, headers=headers)
+        access_token = response.json().get("access_token")
 
-    if not access_token:
-        raise HTTPException(status_code=400, detail="GitHub authentication failed")
+        if not access_token:
+            raise HTTPException(status_code=400, detail="GitHub authentication failed")
 
-    # Fetch user details
-    user_data = requests.get(
-        "https://api.github.com/user",
-        headers={"Authorization": f"token {access_token}"},
-    ).json()
+        # Fetch user details
+        github_headers = {"Authorization": f"token {access_token}"}
+        user_data = (
+            await client.get("https://api.github.com/user", headers=github_headers)
+        ).json()
+        if user_data.get("login"):
+            # Saves the exporter a /user round trip on this user's first export
+            github_exporter.remember_login(access_token, user_data["login"])
+
+        if not user_data.get("email"):
+            emails_response = (
+                await client.get(
+                    "https://api.github.com/user/emails", headers=github_headers
+                )
+            ).json()
 
     avatar_url = user_data.get("avatar_url")
     user_email = user_data.get("email")
@@ -64,14 +77,9 @@ def github_callback(code: str, db: Session = Depends(get_db)):
     if user_data.get("name"):
         data = user_data.get("name").split(" ")
         first_name = data[0]
-        last_name = " ".join(user_data[1]) if len(data) > 1 else None
+        last_name = " ".join(data[1:]) if len(data) > 1 else None
 
     if not user_email:
-        emails_response = requests.get(
-            "https://api.github.com/user/emails",
-            headers={"Authorization": f"token {access_token}"},
-        ).json()
-
         primary_email = next(
             (email["email"] for email in emails_response if email["primary"]), None
         )
@@ -81,7 +89,7 @@ def github_callback(code: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email not found in GitHub account")
 
     # Store it in database
-    user = get_user(user_email, db)
+    user = await get_user(user_email, db)
     if user:
         user.github_token = access_token
         user.avatar_url = avatar_url
@@ -95,8 +103,9 @@ def github_callback(code: str, db: Session = Depends(get_db)):
         )
         db.add(user)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.email)  # OAuth token changed
 
     jwt_token = create_access_token(
         {"email": user.email, "sub": str(user.uuid), "scope": "access_token"}
@@ -112,18 +121,22 @@ def github_callback(code: str, db: Session = Depends(get_db)):
 async def google_auth(request: Request):
     redirect_uri = settings.GOOGLE_REDIRECT_URI
     SCOPES = ["https://www.googleapis.com/auth/documents"]
-    auth_url = await oauth.google.create_authorization_url(
+    google = await get_google_client()
+    auth_url = await google.create_authorization_url(
         redirect_uri, scope=" ".join(SCOPES)
     )
     request.session["oauth_state"] = auth_url["state"]
-    return await oauth.google.authorize_redirect(
-        request, redirect_uri, state=auth_url["state"]
+    # Offline access gets a refresh token, so exports keep working past the
+    # access token's hour
+    return await google.authorize_redirect(
+        request, redirect_uri, state=auth_url["state"], access_type="offline"
     )
 
 
 @router.get("/google/callback")
-async def google_callback(request: Request, db: Session = Depends(get_db)):
-    token = await oauth.google.authorize_access_token(request)
+async def google_callback(request: Request, db: AsyncSession = Depends(get_db)):
+    google = await get_google_client()
+    token = await google.authorize_access_token(request)
     # user_info = await oauth.google.get("https://www.googleapis.com/oauth2/v3/userinfo", token=token)
     user_info = token.get("userinfo")
     if not user_info:
@@ -131,8 +144,9 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
 
     user_email = user_info["email"]
     access_token = token["access_token"]
+    expires_at = token.get("expires_at") or time.time() + token.get("expires_in", 3600)
 
-    user = get_user(user_email, db)
+    user = await get_user(user_email, db)
     first_name = user_info.get("given_name")
     last_name = user_info.get("family_name")
 
@@ -146,9 +160,15 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
         db.add(user)
     else:
         user.google_oauth_token = access_token
-
-    db.commit()
-    db.refresh(user)
+    user.google_token_expires_at = from_timestamp(expires_at)
+    # Only sent on first consent; keep the stored one otherwise
+    if token.get("refresh_token"):
+        user.google_refresh_token = token["refresh_token"]
+
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user(user.email)  # OAuth token changed
+    forget_google_token(user.id)
 
     jwt_token = create_access_token(
         {"email": user.email, "sub": str(user.uuid), "scope": "access_token"}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+from app.utils.metrics import metrics
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("")
+def get_metrics():
+    """Returns process-wide counters (cache hits/misses etc.) and hit ratios"""
+    data = dict(metrics)
+    for name in [key[: -len("_miss")] for key in data if key.endswith("_miss")]:
+        hits, misses = data.get(f"{name}_hit", 0), data[f"{name}_miss"]
+        data[f"{name}_hit_ratio"] = round(hits / (hits + misses), 4)
+    return ORJSONResponse(content=data, status_code=200)
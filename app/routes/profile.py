@@ -1,15 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.responses import ORJSONResponse
-from app.utils.jwt import verify_password, get_password_hash
+from app.utils.jwt import password_hasher
 from app.utils.user import (
-    get_roadmaps_by_user_id,
     get_current_user,
     get_user,
+    invalidate_user,
     require_auth,
 )
 from app.models import (
-    RoadmapResponseSchema,
+    RoadmapPageSchema,
+    RoadmapSummarySchema,
     UserResponse,
     User,
     UserUpdate,
@@ -17,13 +18,17 @@ from app.models import (
 )
 import requests
 from app.database import get_db
+from app.repositories import RoadmapRepository
+from app.settings import settings
 
 router = APIRouter(prefix="/users", tags=["User"])
 
 
 @router.get("/{user_id}")
 @require_auth
-def get_profile(user_id: str, request: Request, db: Session = Depends(get_db)):
+async def get_profile(
+    user_id: str, request: Request, db: AsyncSession = Depends(get_db)
+):
     user = request.state.user
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
@@ -36,11 +41,11 @@ def get_profile(user_id: str, request: Request, db: Session = Depends(get_db)):
 
 @router.put("/{user_id}")
 @require_auth
-def update_profile(
+async def update_profile(
     user_id: int,
     user_update: UserUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update user info"""
 
@@ -49,11 +54,11 @@ def update_profile(
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    if str(current_user["id"]) != user_id:
+    if current_user["id"] != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -61,21 +66,21 @@ def update_profile(
     for key, value in update_data.items():
         setattr(user, key, value)
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_user(user.email)
 
-    user_data = UserResponse.model_dump(user)
+    user_data = UserResponse.model_validate(user).model_dump()
     data = {"message": "Profile updated successfully", "user": user_data}
     return ORJSONResponse(content=data, status_code=200)
 
 
 @router.put("/{user_id}/change-password")
 @require_auth
-def update_password(
+async def update_password(
     user_id: str,
     password_update: PasswordUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Add or update user password"""
     current_user = request.state.user
@@ -86,36 +91,59 @@ def update_password(
     if str(current_user["id"]) != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    user = get_user(current_user.email, db)
+    user = await get_user(current_user.email, db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if verify_password(request.password, user.hashed_password):
+    if user.hashed_password and await password_hasher.verify(
+        password_update.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=400,
             detail="New password cannot be the same as the old password",
         )
 
-    user.hashed_password = get_password_hash(request.password)
-    db.commit()
+    user.hashed_password = await password_hasher.hash(password_update.password)
+    await db.commit()
+    invalidate_user(user.email)
     data = {"message": "Password changed successfully"}
     return ORJSONResponse(content=data, status_code=200)
 
 
-@router.get("/{user_id}/roadmaps", response_model=list[RoadmapResponseSchema])
+@router.get("/{user_id}/roadmaps", response_model=RoadmapPageSchema)
 @require_auth
-def get_previous_roadmaps(
-    user_id: str, request: Request, db: Session = Depends(get_db)
+async def get_previous_roadmaps(
+    user_id: str,
+    request: Request,
+    limit: int = Query(settings.ROADMAP_PAGE_SIZE, ge=1),
+    cursor: str | None = None,
+    include: str | None = None,
+    db: AsyncSession = Depends(get_db),
 ):
-    """Returns previous roadmaps"""
+    """
+    Returns a page of previous roadmaps, newest first. Pass next_cursor back as
+    ?cursor= for the next page, and ?include=content to get the roadmap bodies.
+    """
 
     user = request.state.user
     if not user:
-        raise HTTPException(status=401, detail="Authentication required")
+        raise HTTPException(status_code=401, detail="Authentication required")
 
     if str(user["id"]) != user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    roadmaps = get_roadmaps_by_user_id(user.id)
-    serialized_roadmaps = [RoadmapSchema.model_dump(r) for r in roadmaps]
-    return ORJSONResponse(content=serialized_roadmaps, status_code=200)
+    roadmaps, next_cursor = await RoadmapRepository(db).list_for_user(
+        user.id,
+        limit=min(limit, settings.ROADMAP_MAX_PAGE_SIZE),
+        cursor=cursor,
+        include_content=include == "content",
+    )
+    exclude = None if include == "content" else {"content"}
+    data = {
+        "roadmaps": [
+            RoadmapSummarySchema.model_validate(r).model_dump(exclude=exclude)
+            for r in roadmaps
+        ],
+        "next_cursor": next_cursor,
+    }
+    return ORJSONResponse(content=data, status_code=200)
@@ -1,16 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from fastapi.responses import ORJSONResponse
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from app.database import AsyncSessionLocal, get_db
 from app.utils.user import get_current_user, get_user, require_auth
 from app.settings import settings
-from app.models import GenerateRoadmapSchema, User, Roadmap
-from app.utils.google import is_google_token_active, is_google_token_valid
-from mistralai import Mistral
-from openai import OpenAI
+from app.models import (
+    GenerateRoadmapSchema,
+    Job,
+    JobResponseSchema,
+    ProgressUpdateSchema,
+    RoadmapResponseSchema,
+    RoadmapSearchPageSchema,
+    RoadmapSearchResultSchema,
+)
+from app.repositories import RoadmapRepository, RoadmapSearchRepository
+from app.utils.gdocs import GoogleTokenRejected, create_google_doc
+from app.utils.google import get_google_access_token, renew_google_access_token
+from app.utils.progress import (
+    count_done,
+    done_topic_ids,
+    render_checklist,
+    with_progress,
+)
+from app.utils.cache import get_cached_roadmap, make_cache_key, set_cached_roadmap
+from app.utils.jobs import (
+    FINISHED_STATUSES,
+    GENERATE_ROADMAP_JOB,
+    GITHUB_EXPORT_JOB,
+    job_workers,
+)
+from app.utils.llm import (
+    ROADMAP_PROMPT_VERSION,
+    generate_roadmap_content,
+    get_model,
+    stream_roadmap_content,
+)
 from fastapi import HTTPException
-import requests
-import base64
+import anyio
+import asyncio
+import json
+import time
+from contextlib import aclosing
 
 
 router = APIRouter(prefix="/roadmaps", tags=["Roadmaps"])
@@ -18,338 +50,440 @@ router = APIRouter(prefix="/roadmaps", tags=["Roadmaps"])
 
 @router.post("/generate")
 @require_auth
-def generate_roadmap(
+async def generate_roadmap(
     roadmap_request: GenerateRoadmapSchema,
     request: Request,
-    db: Session = Depends(get_db),
+    background: bool = False,
+    db: AsyncSession = Depends(get_db),
 ):
-    roadmap_prompt = f"""
-        Generate a structured course roadmap based on the following criteria:
-        - **Topic:** {roadmap_request.topic} Roadmap
-        - **Level:** {roadmap_request.level}
-        - **Format:** Strictly Markdown format with bullet points and bold headers.
-        - **Structure:**
-            - Course title (in bold)
-            - Modules (in bold) with key topics as bullet points.
-        - **Formatting Rules:**
-            - Each module must have a title in `**bold**`
-            - Key topics within modules must be in `- ` bullet points.
-            - No introduction, explanation, or additional text.
-            - Output should **only** contain the structured roadmap.
-            - No title, subtitles, or descriptions beyond the roadmap itself.
-
-        ### **Example Format:**
-            # Course Title
-            - ## Module 1: Name
-                - [ ] Topic 1 
-                - [ ] Topic 2
-
-            - ## Module 2: Name
-                - [ ] Topic 1
-                - [ ]Topic 2
-
+    """
+    Generates a roadmap. With ?background=true a job is queued instead and its
+    id returned immediately; poll /roadmaps/jobs/{job_id} for the result.
     """
     try:
         user = request.state.user
         if not user:
             raise HTTPException(status_code=401, detail="Authentication required")
 
-        client = get_client()
-        model = (
-            settings.MISTRAL_AI_MODEL if settings.USE_OPENAI else settings.OPENAI_MODEL
+        if background:
+            job = await job_workers.enqueue(
+                GENERATE_ROADMAP_JOB, user.id, roadmap_request.model_dump(), db
+            )
+            data = {"message": "Queued", "job": job.id, "status": job.status}
+            return ORJSONResponse(
+                content=data,
+                status_code=202,
+                headers={"Location": f"{settings.PREFIX}/roadmaps/jobs/{job.id}"},
+            )
+
+        roadmap_content, cached = await generate_roadmap_content(
+            roadmap_request.topic,
+            roadmap_request.level,
+            bypass_cache=roadmap_request.bypass_cache,
         )
-        chat_response = client.chat.complete(
-            model=model, messages=[{"role": "user", "content": roadmap_prompt}]
+        roadmap = await RoadmapRepository(db).create(
+            user.id,
+            f"{roadmap_request.topic} {roadmap_request.level} Roadmap",
+            roadmap_content,
         )
-        roadmap_content = chat_response.choices[0].message.content
-        roadmap = Roadmap(
-            title=f"{roadmap_request.topic} {roadmap_request.level} Roadmap",
-            content=roadmap_content,
-            user_id=user.id,
+        await db.commit()
+        data = {"message": "Success", "roadmap": roadmap.id, "cached": cached}
+        return ORJSONResponse(
+            content=data,
+            status_code=200,
+            headers={"X-Cache": "HIT" if cached else "MISS"},
         )
-        db.add(roadmap)
-        db.commit()
-        db.refresh(roadmap)
-        data = {"message": "Success", "roadmap": roadmap.id}
-        return ORJSONResponse(content=data, status_code=200)
+    except HTTPException:
+        raise
     except Exception as e:
-        return {"error": str(e)}, 400
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/generate/batch")
+@require_auth
+async def generate_roadmap_batch(
+    roadmap_requests: list[GenerateRoadmapSchema],
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Generates several roadmaps concurrently (at most ROADMAP_BATCH_PARALLELISM
+    at a time) and inserts them in a single transaction. Failed items are
+    reported per item and don't fail the batch.
+    """
+    user = request.state.user
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    if not roadmap_requests:
+        raise HTTPException(status_code=400, detail="No roadmaps requested")
+    if len(roadmap_requests) > settings.ROADMAP_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ROADMAP_BATCH_MAX_ITEMS} roadmaps per batch",
+        )
+
+    semaphore = asyncio.Semaphore(settings.ROADMAP_BATCH_PARALLELISM)
+
+    async def generate(item: GenerateRoadmapSchema):
+        async with semaphore:
+            return await generate_roadmap_content(
+                item.topic, item.level, bypass_cache=item.bypass_cache
+            )
+
+    outcomes = await asyncio.gather(
+        *[generate(item) for item in roadmap_requests], return_exceptions=True
+    )
+
+    items = []
+    results = []
+    created = []  # Results that get a roadmap, in items order
+    for item, outcome in zip(roadmap_requests, outcomes):
+        result = {"topic": item.topic, "level": item.level}
+        if isinstance(outcome, Exception):
+            result["error"] = str(outcome) or outcome.__class__.__name__
+        else:
+            content, cached = outcome
+            items.append((f"{item.topic} {item.level} Roadmap", content))
+            created.append(result)
+            result["cached"] = cached
+        results.append(result)
+
+    roadmaps = await RoadmapRepository(db).create_many(user.id, items)
+    await db.commit()
+    for result, roadmap in zip(created, roadmaps):
+        result["roadmap"] = roadmap.id
+
+    data = {"message": "Success", "results": results}
+    return ORJSONResponse(content=data, status_code=200)
+
+
+@router.post("/generate/stream")
+@require_auth
+async def generate_roadmap_stream(
+    roadmap_request: GenerateRoadmapSchema,
+    request: Request,
+):
+    """Streams the roadmap markdown as Server-Sent Events while it is generated"""
+    user = request.state.user
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    user_id = user.id
+    title = f"{roadmap_request.topic} {roadmap_request.level} Roadmap"
+    model = get_model()
+    key = make_cache_key(
+        roadmap_request.topic, roadmap_request.level, model, ROADMAP_PROMPT_VERSION
+    )
+    cached = None if roadmap_request.bypass_cache else await get_cached_roadmap(key)
+
+    async def event_stream():
+        chunks = []
+        completed = False
+        error = None
+        try:
+            if cached is not None:
+                chunks.append(cached)
+                yield format_sse("chunk", {"content": cached})
+            else:
+                stream = stream_roadmap_content(
+                    roadmap_request.topic, roadmap_request.level
+                )
+                # aclosing releases the provider stream (and its concurrency
+                # slot) as soon as the client goes away
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        chunks.append(chunk)
+                        yield format_sse("chunk", {"content": chunk})
+            completed = True
+        except Exception as e:
+            error = str(e)
+        finally:
+            # Runs on completion, provider errors and client disconnects alike,
+            # so whatever was generated is stored exactly once. Shielded, since
+            # a disconnect cancels every await in the response's task group.
+            with anyio.CancelScope(shield=True):
+                # Only new, complete content is cached; a hit is already there
+                cache_key = key if completed and cached is None else None
+                roadmap_id = await save_streamed_roadmap(
+                    user_id, title, "".join(chunks), cache_key, model
+                )
+
+        if error:
+            yield format_sse("error", {"error": error, "roadmap": roadmap_id})
+        else:
+            data = {"roadmap": roadmap_id, "cached": cached is not None}
+            yield format_sse("done", data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Don't let nginx buffer the stream
+            "X-Cache": "HIT" if cached is not None else "MISS",
+        },
+    )
 
 
-def get_client():
-    if settings.USE_OPENAI:
-        client = Mistral(api_key=settings.MISTRAL_API_KEY)
-    else:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-    return client
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def save_streamed_roadmap(
+    user_id: int, title: str, content: str, cache_key: str | None, model: str
+):
+    """
+    Persists a streamed roadmap with its own session, since the request session
+    is closed before the response body is sent.
+
+    Only newly generated, complete content (a cache_key is passed) is written to
+    the cache.
+    """
+    if not content:
+        return None
+
+    async with AsyncSessionLocal() as db:
+        if cache_key:
+            await set_cached_roadmap(cache_key, content, model, db)
+        roadmap = await RoadmapRepository(db).create(user_id, title, content)
+        await db.commit()
+        return roadmap.id
+
+
+@router.get("/jobs/{job_id}")
+@require_auth
+async def get_job(
+    job_id: str,
+    request: Request,
+    wait: float = 0,
+):
+    """Returns a job's status, waiting up to `wait` seconds for it to finish"""
+    user = request.state.user
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    deadline = time.monotonic() + min(max(wait, 0), settings.JOB_MAX_WAIT)
+    while True:
+        # A session per check, so no pooled connection is held while sleeping
+        async with AsyncSessionLocal() as db:
+            job = await db.scalar(
+                select(Job).where(Job.id == job_id, Job.user_id == user.id)
+            )
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status in FINISHED_STATUSES or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    data = {"job": JobResponseSchema.model_validate(job).model_dump()}
+    return ORJSONResponse(content=data, status_code=200)
+
+
+# Before /{roadmap_id}, which would otherwise take "search" as an id
+@router.get("/search", response_model=RoadmapSearchPageSchema)
+@require_auth
+async def search_roadmaps(
+    request: Request,
+    q: str = Query(..., max_length=200),
+    limit: int = Query(settings.ROADMAP_PAGE_SIZE, ge=1),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Searches the user's roadmaps by title and content, best matches first.
+    Titles and snippets are HTML, escaped, with matching words wrapped in
+    <mark></mark>. Pass next_offset back as ?offset= for the next page.
+    """
+    user = request.state.user
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+
+    results, next_offset = await RoadmapSearchRepository(db).search(
+        user.id, q, min(limit, settings.ROADMAP_MAX_PAGE_SIZE), offset
+    )
+    data = {
+        "results": [
+            RoadmapSearchResultSchema.model_validate(r).model_dump() for r in results
+        ],
+        "next_offset": next_offset,
+    }
+    return ORJSONResponse(content=data, status_code=200)
 
 
 @router.get("/{roadmap_id}")
 @require_auth
-def get_roadmap(roadmap_id: int, request: Request, db: Session = Depends(get_db)):
+async def get_roadmap(
+    roadmap_id: int,
+    request: Request,
+    include: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns a roadmap with its progress ticked in the checklist; ?include=structure
+    adds its parsed modules and topics, each with "done"
+    """
     try:
         user = request.state.user
         if not user:
             raise HTTPException(status_code=401, detail="Authentication required")
 
-        roadmap = (
-            db.query(Roadmap)
-            .filter(Roadmap.id == roadmap_id, User.id == user.id)
-            .first()
+        roadmap = await RoadmapRepository(db).get_for_user(
+            roadmap_id, user.id, include_content=True
         )
 
         if not roadmap:
             raise HTTPException(status_code=404, detail="Roadmap not found")
-        data = {"roadmap": RoadmapResponseSchema.from_orm(roadmap).model_dump()}
+        exclude = None if include == "structure" else {"structure"}
+        data = {
+            "roadmap": RoadmapResponseSchema.from_orm(roadmap).model_dump(
+                exclude=exclude
+            )
+        }
+        if roadmap.structure:
+            data["roadmap"]["content"] = render_checklist(
+                roadmap.content, roadmap.structure, roadmap.progress
+            )
+            if include == "structure":
+                data["roadmap"]["structure"] = with_progress(
+                    roadmap.structure, roadmap.progress
+                )
         return ORJSONResponse(content=data, status_code=200)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/{roadmap_id}/save-to-github")
+@router.patch("/{roadmap_id}/progress")
 @require_auth
-def save_to_github(
+async def update_progress(
     roadmap_id: int,
+    progress_update: ProgressUpdateSchema,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Saves a roadmap to a GitHub repository"""
-    current_user = request.state.user
+    """
+    Marks topics done or not done, e.g. {"topics": {"1.2": true, "3.1": false}},
+    with topic ids from ?include=structure
+    """
+    user = request.state.user
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
 
-    # Check user authentication
-    if current_user["id"] != user_id:
-        raise HTTPException(status_code=403, detail="Authentication required")
-
-    # Fetch roadmap from DB
-    roadmap = (
-        db.query(Roadmap)
-        .filter(Roadmap.id == roadmap_id, User.id == current_user["id"])
-        .first()
+    updated = await RoadmapRepository(db).update_progress(
+        roadmap_id, user.id, progress_update.topics
     )
-
-    if not roadmap:
+    if updated is None:
         raise HTTPException(status_code=404, detail="Roadmap not found")
+    await db.commit()
 
-    access_token = user.github_token
-    if not access_token:
-        raise HTTPException(status_code=403, detail="GitHub not linked")
-
-    # Get GitHub username
-    headers = {
-        "Authorization": f"token {access_token}",
-        "Accept": "application/vnd.github.v3+json",
+    progress, total = updated
+    data = {
+        "message": "Progress updated",
+        "progress": {"done": count_done(progress), "total": total},
     }
-    user_response = requests.get("https://api.github.com/user", headers=headers)
-    if user_response.status_code != 200:
-        raise HTTPException(status_code=400, detail="Failed to fetch GitHub user")
-
-    github_username = user_response.json()["login"]
-
-    repo_name = (
-        f"{roadmap.title.replace(' ', '-').lower()}-roadmap"
-        if roadmap.title
-        else "ai-roadmap"
-    )
-    repo_url = "https://api.github.com/user/repos"
+    return ORJSONResponse(content=data, status_code=200)
 
-    repo_data = {
-        "name": repo_name,
-        "description": "AI-generated roadmap",
-        "private": False,
-    }
-    repo_response = requests.post(repo_url, json=repo_data, headers=headers)
-
-    if repo_response.status_code != 201 and repo_response.status_code != 422:
-        raise HTTPException(status_code=400, detail="Failed to create repository")
-
-    def get_file_sha(file_name: str):
-        file_url = f"https://api.github.com/repos/{github_username}/{repo_name}/contents/{file_name}"
-        response = requests.get(file_url, headers=headers)
-
-        if response.status_code == 200:
-            return response.json()["sha"]  # Return existing file SHA for updates
-        return None  # File does not exist, so we can create a new one
-
-    # Function to upload or update a file
-    def upload_file(file_name: str, content: str):
-        file_url = f"https://api.github.com/repos/{github_username}/{repo_name}/contents/{file_name}"
-        file_content = base64.b64encode(content.encode()).decode()
-
-        file_data = {
-            "message": (
-                f"Updated {file_name}"
-                if get_file_sha(file_name)
-                else f"Added {file_name}"
-            ),
-            "content": file_content,
-            "branch": "main",
-        }
 
-        sha = get_file_sha(file_name)
-        if sha:
-            file_data["sha"] = sha  # Include SHA if updating an existing file
+@router.post("/{roadmap_id}/save-to-github")
+@require_auth
+async def save_to_github(
+    roadmap_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queues an export of the roadmap to a GitHub repository and returns the job;
+    poll /roadmaps/jobs/{job_id} for its progress and the repository URL. While
+    an export of the roadmap is unfinished, saving again returns the same job.
+    """
+    current_user = request.state.user
 
-        file_response = requests.put(file_url, json=file_data, headers=headers)
-        if file_response.status_code not in [200, 201]:
-            raise HTTPException(status_code=400, detail=f"Failed to upload {file_name}")
+    # Check user authentication
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Authentication required")
 
-    # Generate README.md content
-    readme_content = f"""# {repo_name}\n\n## Roadmap\n\nSee [ROADMAP.md](./ROADMAP.md) for details. \n\nGenerated by AI Roadmap Generator\n"""
+    # Check the roadmap exists and belongs to the user
+    if not await RoadmapRepository(db).get_for_user(roadmap_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Roadmap not found")
 
-    # Upload README.md
-    upload_file("README.md", readme_content)
+    if not current_user.github_token:
+        raise HTTPException(status_code=403, detail="GitHub not linked")
 
-    # Upload ROADMAP.md
-    upload_file("ROADMAP.md", roadmap.content)
-    data = {
-        "message": "Roadmap saved to GitHub",
-        "repo_url": f"https://github.com/{github_username}/{repo_name}",
-    }
-    return ORJSONResponse(content=data, status_code=200)
+    job = await job_workers.enqueue(
+        GITHUB_EXPORT_JOB,
+        current_user.id,
+        {"roadmap_id": roadmap_id},
+        db,
+        dedupe_key=f"{GITHUB_EXPORT_JOB}:{roadmap_id}",
+    )
+    data = {"message": "Queued", "job": job.id, "status": job.status}
+    return ORJSONResponse(
+        content=data,
+        status_code=202,
+        headers={"Location": f"{settings.PREFIX}/roadmaps/jobs/{job.id}"},
+    )
 
 
 @router.delete("/{roadmap_id}")
 @require_auth
-def delete_roadmap(roadmap_id: int, request: Request, db: Session = Depends(get_db)):
+async def delete_roadmap(
+    roadmap_id: int, request: Request, db: AsyncSession = Depends(get_db)
+):
     current_user = request.state.user
 
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    roadmap = (
-        db.query(Roadmap)
-        .filter(Roadmap.id == roadmap_id, Roadmap.user_id == current_user["id"])
-        .first()
-    )
-    if not roadmap:
+    if not await RoadmapRepository(db).delete_for_user(roadmap_id, current_user.id):
         raise HTTPException(status_code=404, detail="Roadmap not found")
-
-    db.delete(roadmap)
-    db.commit()
+    await db.commit()
     data = {"message": "Roadmap deleted"}
     return ORJSONResponse(content=data, status_code=200)
 
 
 @router.post("/{roadmap_id}/upload-to-google-docs")
 @require_auth
-def save_google_docs(
-    roadmap_id: str,
+async def save_google_docs(
+    roadmap_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     user = request.state.user
 
     if not user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
-    access_token = user.google_oauth_token
-    if not access_token:
+    if not user.google_oauth_token:
         raise HTTPException(status_code=401, detail="Google authentication required")
 
-    if not is_google_token_active(access_token) or not is_google_token_valid(
-        access_token
-    ):
-        return HTTPException(
-            status_code=400, detail="Oauth token is invalid or expired"
-        )
+    # Cached until shortly before expiry, refreshed when there's a refresh token
+    access_token = await get_google_access_token(user.id)
+    if not access_token:
+        raise HTTPException(status_code=400, detail="Oauth token is invalid or expired")
 
-    roadmap = db.query(Roadmap).filter(Roadmap.id == roadmap_id).first()
+    # The structure is all the export needs, not the markdown
+    roadmap = await RoadmapRepository(db).get_for_user(roadmap_id, user.id)
     if not roadmap:
         raise HTTPException(status_code=404, detail="Roadmap not found")
 
-    # TODO: Valid google access token
-
-    url = "https://docs.googleapis.com/v1/documents"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json",
-    }
-
-    data = {"title": f"Roadmap: {roadmap.title if roadmap.title else 'AI Roadmap'}"}
-    response = requests.post(url, headers=headers, json=data)
-
-    if response.status_code != 200:
-        error_detail = str(response.content)
-        raise HTTPException(status_code=400, detail=error_detail)
-
-    document_id = response.json().get("documentId")
-
-    content_url = f"https://docs.googleapis.com/v1/documents/{document_id}:batchUpdate"
-    data = format_roadmap_to_checklist(roadmap.content)
-    content_response = requests.post(content_url, headers=headers, json=data)
-    if content_response.status_code != 200:
-        print("Google Docs API Error:", content_response.text)
-        raise HTTPException(status_code=400, detail="Failed to insert roadmap content")
-    return {"message": "Saved to Google Docs", "document_id": document_id}, 200
-
-
-def format_roadmap_to_checklist(content: str):
-    requests = []
-    index = 1  # Start at index 1 for document positioning
-
-    lines = content.split("\n")
-
-    for line in lines:
-        line = line.replace("*", "").replace("-", "").strip()
-
-        if not line:
-            continue
-
-        start_index = index
-
-        # print(line)
-        if line.startswith("# "):
-            text = line.replace("# ", "")
-            requests.append(
-                {"insertText": {"location": {"index": index}, "text": text + "\n\n"}}
-            )
-            requests.append(
-                {
-                    "updateParagraphStyle": {
-                        "range": {
-                            "startIndex": index,
-                            "endIndex": start_index + len(text),
-                        },
-                        "paragraphStyle": {"namedStyleType": "TITLE"},
-                        "fields": "namedStyleType",
-                    }
-                }
-            )
-
-        elif line.startswith("## "):
-            text = line.replace("## ", "")
-            requests.append(
-                {"insertText": {"location": {"index": index}, "text": text + "\n\n"}}
-            )
-            requests.append(
-                {
-                    "updateParagraphStyle": {
-                        "range": {
-                            "startIndex": start_index,
-                            "endIndex": start_index + len(text),
-                        },
-                        "paragraphStyle": {"namedStyleType": "HEADING_2"},
-                        "fields": "namedStyleType",
-                    }
-                }
-            )
-
-        elif line.startswith("[ ]"):
-            text = line.replace("[ ]", "")
-            requests.append(
-                {"insertText": {"location": {"index": index}, "text": text + "\n"}}
-            )
-            requests.append(
-                {
-                    "createParagraphBullets": {
-                        "range": {
-                            "startIndex": start_index,
-                            "endIndex": start_index + len(text),
-                        },
-                        "bulletPreset": "BULLET_CHECKBOX",
-                    }
-                }
+    done = done_topic_ids(roadmap.structure, roadmap.progress)
+    # The Google calls are blocking, keep them off the event loop
+    try:
+        document_id = await run_in_threadpool(
+            create_google_doc, access_token, roadmap.title, roadmap.structure, done
+        )
+    except GoogleTokenRejected:
+        # The cached token was revoked early; refresh it and try once more
+        access_token = await renew_google_access_token(user.id)
+        if not access_token:
+            raise HTTPException(
+                status_code=400, detail="Oauth token is invalid or expired"
             )
-        index += len(text) + 1
-    return {"requests": requests}
+        document_id = await run_in_threadpool(
+            create_google_doc, access_token, roadmap.title, roadmap.structure, done
+        )
+    data = {"message": "Saved to Google Docs", "document_id": document_id}
+    return ORJSONResponse(content=data, status_code=200)
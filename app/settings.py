@@ -13,6 +13,24 @@ class Settings:
     if not DATABASE_URL:
         print("Error: DATABASE_URL not set!")
 
+    # SQLite tuning, applied to every connection (ignored for other databases).
+    # A negative cache_size is in KiB.
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # Safe with WAL
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64000))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))  # ms
+    # Reader connections per process (no overflow). More readers interleave on
+    # the event loop with the single writer and stretch its transactions
+    SQLITE_READERS = int(os.getenv("SQLITE_READERS", 5))
+
+    # Connection pool, applied to both the async (request) and sync (CLI) engines
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 30 * 60))  # seconds
+
     SECRET_KEY = os.getenv("SECRET_KEY")
     if not SECRET_KEY:
         print("Error: SECRET_KEY not set!")
@@ -24,9 +42,46 @@ class Settings:
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
     GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
+    # OAuth provider discovery documents are cached on disk for this long
+    OAUTH_METADATA_CACHE_DIR = os.getenv("OAUTH_METADATA_CACHE_DIR", ".cache")
+    OAUTH_METADATA_TTL = int(os.getenv("OAUTH_METADATA_TTL", 24 * 60 * 60))  # seconds
+    # Google access tokens count as valid until this long before they expire.
+    # Tokens of users active in the last GOOGLE_TOKEN_ACTIVE_WINDOW are
+    # refreshed in the background GOOGLE_TOKEN_REFRESH_AHEAD before expiry.
+    GOOGLE_TOKEN_EXPIRY_MARGIN = int(os.getenv("GOOGLE_TOKEN_EXPIRY_MARGIN", 300))
+    GOOGLE_TOKEN_REFRESH_AHEAD = int(os.getenv("GOOGLE_TOKEN_REFRESH_AHEAD", 600))
+    GOOGLE_TOKEN_REFRESH_INTERVAL = int(os.getenv("GOOGLE_TOKEN_REFRESH_INTERVAL", 60))
+    GOOGLE_TOKEN_ACTIVE_WINDOW = int(os.getenv("GOOGLE_TOKEN_ACTIVE_WINDOW", 60 * 60))
     GITHUB_CLIENT_ID = os.getenv("GITHUB_CLIENT_ID")
     GITHUB_CLIENT_SECRET = os.getenv("GITHUB_CLIENT_SECRET")
     GITHUB_REDIRECT_URI = os.getenv("GITHUB_REDIRECT_URI")
+    # GitHub export: one pooled keep-alive session per process
+    GITHUB_API_BASE_URL = os.getenv("GITHUB_API_BASE_URL", "https://api.github.com")
+    GITHUB_TIMEOUT = float(os.getenv("GITHUB_TIMEOUT", 15))  # seconds
+    GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", 10))
+    GITHUB_LOGIN_CACHE_MAXSIZE = int(os.getenv("GITHUB_LOGIN_CACHE_MAXSIZE", 10000))
+    GITHUB_LOGIN_CACHE_TTL = int(
+        os.getenv("GITHUB_LOGIN_CACHE_TTL", 60 * 60)
+    )  # seconds
+    # Retries of 5xx and rate-limited calls within an export; waits longer than
+    # GITHUB_MAX_RETRY_WAIT requeue the export job instead of blocking a thread
+    GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", 3))
+    GITHUB_RETRY_BACKOFF = float(os.getenv("GITHUB_RETRY_BACKOFF", 1))  # seconds
+    GITHUB_MAX_RETRY_WAIT = float(os.getenv("GITHUB_MAX_RETRY_WAIT", 30))  # seconds
+    GITHUB_EXPORTS_PER_TOKEN = int(os.getenv("GITHUB_EXPORTS_PER_TOKEN", 1))
+    # Cap on one export's total time. Keep it under JOB_VISIBILITY_TIMEOUT, so
+    # the export thread is done before its job can be leased again
+    GITHUB_EXPORT_TIMEOUT = float(os.getenv("GITHUB_EXPORT_TIMEOUT", 240))  # seconds
+    # Google Docs export. A call that times out fails the export with a 502
+    GOOGLE_DOCS_CONNECT_TIMEOUT = float(
+        os.getenv("GOOGLE_DOCS_CONNECT_TIMEOUT", 5)
+    )  # seconds
+    GOOGLE_DOCS_TIMEOUT = float(os.getenv("GOOGLE_DOCS_TIMEOUT", 30))  # seconds
+    # batchUpdate bodies are split to stay under both
+    GOOGLE_DOCS_BATCH_MAX_REQUESTS = int(
+        os.getenv("GOOGLE_DOCS_BATCH_MAX_REQUESTS", 500)
+    )
+    GOOGLE_DOCS_BATCH_MAX_BYTES = int(os.getenv("GOOGLE_DOCS_BATCH_MAX_BYTES", 1000000))
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     MISTRAL_AI_MODEL = os.getenv("MISTRAL_AI_MODEL")
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
@@ -37,5 +92,64 @@ class Settings:
     if USE_OPENAI and not OPENAI_API_KEY:
         print("Error: OPENAI SECRET KEY not set!")
 
+    # Password hashing. BCRYPT_TARGET_MS > 0 calibrates the cost at startup to
+    # the highest one that hashes within that many milliseconds on this host;
+    # existing hashes are upgraded on the next successful login.
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", 0))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 32))
+
+    # Verified JWT claims cache (per process, entries live until the token's exp)
+    JWT_CACHE_MAXSIZE = int(os.getenv("JWT_CACHE_MAXSIZE", 10000))
+
+    # Authenticated user cache (per process)
+    USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", 10000))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))  # seconds
+
+    # Shared LLM provider clients
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))  # seconds
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))  # seconds
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))  # seconds
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 10))
+
+    # /users/{user_id}/roadmaps pagination
+    ROADMAP_PAGE_SIZE = int(os.getenv("ROADMAP_PAGE_SIZE", 20))
+    ROADMAP_MAX_PAGE_SIZE = int(os.getenv("ROADMAP_MAX_PAGE_SIZE", 100))
+    # PATCH /roadmaps/{id}/progress attempts when toggles race
+    ROADMAP_PROGRESS_RETRIES = int(os.getenv("ROADMAP_PROGRESS_RETRIES", 5))
+
+    # /roadmaps/search. The language is the Postgres text search config, used
+    # when a roadmap is indexed and when the index is queried
+    ROADMAP_SEARCH_LANGUAGE = os.getenv("ROADMAP_SEARCH_LANGUAGE", "english")
+    ROADMAP_SEARCH_SNIPPET_WORDS = int(os.getenv("ROADMAP_SEARCH_SNIPPET_WORDS", 24))
+
+    # /roadmaps/generate/batch
+    ROADMAP_BATCH_MAX_ITEMS = int(os.getenv("ROADMAP_BATCH_MAX_ITEMS", 20))
+    ROADMAP_BATCH_PARALLELISM = int(os.getenv("ROADMAP_BATCH_PARALLELISM", 5))
+
+    # Background jobs. JOB_QUEUE_BACKEND is "redis", "database" or "auto"
+    # (Redis when reachable, otherwise the database)
+    JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "auto")
+    JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 2))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", 300))  # seconds
+    JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", 5))  # seconds
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))  # seconds
+    JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", 30))  # long-poll cap, seconds
+
+    # Generated roadmap cache: in-memory LRU tier in front of the database tier
+    ROADMAP_CACHE_MAXSIZE = int(os.getenv("ROADMAP_CACHE_MAXSIZE", 1024))
+    ROADMAP_CACHE_TTL = int(os.getenv("ROADMAP_CACHE_TTL", 60 * 60))  # seconds
+    ROADMAP_CACHE_DB_TTL = int(
+        os.getenv("ROADMAP_CACHE_DB_TTL", 7 * 24 * 60 * 60)
+    )  # seconds
+    # How often expired rows are deleted from the database tier
+    ROADMAP_CACHE_PURGE_INTERVAL = int(
+        os.getenv("ROADMAP_CACHE_PURGE_INTERVAL", 60 * 60)
+    )  # seconds
+
 
 settings = Settings()
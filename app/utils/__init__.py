@@ -1 +0,0 @@
-from .google import oauth
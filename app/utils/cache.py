@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import re
+from datetime import datetime, timedelta
+from cachetools import TTLCache
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
+from app.models import RoadmapCache
+from app.settings import settings
+from app.utils.metrics import metrics
+
+# In-memory tier, bounded by size (LRU) and age (TTL). Backed by the roadmap_cache table.
+roadmap_cache = TTLCache(
+    maxsize=settings.ROADMAP_CACHE_MAXSIZE, ttl=settings.ROADMAP_CACHE_TTL
+)
+
+
+def normalize(value: str) -> str:
+    """Lowercase and collapse whitespace so 'Python ' and 'python' share a key."""
+    return re.sub(r"\s+", " ", value or "").strip().lower()
+
+
+def make_cache_key(topic: str, level: str, model: str, prompt_version: int) -> str:
+    """Build the cache key for a generation request."""
+    raw = "|".join(
+        [normalize(topic), normalize(level), model or "", str(prompt_version)]
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def get_cached_roadmap(key: str) -> str | None:
+    """
+    Return cached roadmap content, checking memory first and then the database.
+
+    The database is read with a session of its own, closed straight away: a
+    miss is followed by an LLM call, and a caller's session would keep its
+    pooled connection for all of it.
+    """
+    content = roadmap_cache.get(key)
+    if content is not None:
+        metrics["roadmap_cache_hit"] += 1
+        metrics["roadmap_cache_memory_hit"] += 1
+        return content
+
+    async with AsyncSessionLocal() as db:
+        content = await db.scalar(
+            select(RoadmapCache.content).where(
+                RoadmapCache.key == key, RoadmapCache.expires_at > datetime.utcnow()
+            )
+        )
+    if content is not None:
+        roadmap_cache[key] = content
+        metrics["roadmap_cache_hit"] += 1
+        metrics["roadmap_cache_db_hit"] += 1
+        return content
+
+    metrics["roadmap_cache_miss"] += 1
+    return None
+
+
+async def set_cached_roadmap(key: str, content: str, model: str, db: AsyncSession):
+    """Store roadmap content in both cache tiers."""
+    roadmap_cache[key] = content
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.ROADMAP_CACHE_DB_TTL)
+
+    entry = await db.get(RoadmapCache, key)
+    if entry:
+        entry.content = content
+        entry.model = model
+        entry.expires_at = expires_at
+    else:
+        db.add(
+            RoadmapCache(key=key, model=model, content=content, expires_at=expires_at)
+        )
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Another worker stored the same key first, its copy is just as good
+        await db.rollback()
+
+
+async def purge_expired_roadmaps() -> int:
+    """
+    Deletes expired rows from the database tier, 500 at a time so no write
+    transaction runs long. Returns how many were deleted.
+    """
+    deleted = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            expired = (
+                select(RoadmapCache.key)
+                .where(RoadmapCache.expires_at <= datetime.utcnow())
+                .limit(500)
+            )
+            result = await db.execute(
+                delete(RoadmapCache).where(RoadmapCache.key.in_(expired))
+            )
+            await db.commit()
+        deleted += result.rowcount
+        if result.rowcount < 500:
+            return deleted
+
+
+async def purge_roadmap_cache():
+    """Runs for the app's lifetime, purging expired cache rows periodically."""
+    while True:
+        try:
+            deleted = await purge_expired_roadmaps()
+            metrics["roadmap_cache_purged"] += deleted
+        except Exception as e:
+            print(f"Roadmap cache purge failed: {e}")
+        await asyncio.sleep(settings.ROADMAP_CACHE_PURGE_INTERVAL)
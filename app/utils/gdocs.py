@@ -0,0 +1,225 @@
+"""
+Roadmap structure -> Google Docs batchUpdate requests.
+
+The parsed roadmap (app.utils.roadmap_parser) is compiled in one pass into a
+single text (inserted with as few insertText requests as the batch size allows)
+plus style requests over ranges of it. Consecutive paragraphs with the same
+style share one request, as do touching struck-through (done) topics. Docs
+indexes are in UTF-16 code units, so offsets are counted in those rather than
+in Python characters.
+"""
+
+import json
+import requests
+from fastapi import HTTPException
+from app.settings import settings
+
+DOCS_API_URL = "https://docs.googleapis.com/v1/documents"
+
+TITLE_STYLE = "TITLE"
+MODULE_STYLE = "HEADING_2"
+TOPIC_BULLETS = "BULLET_CHECKBOX"
+
+docs_session = requests.Session()
+
+
+class GoogleTokenRejected(HTTPException):
+    """The Docs API answered 401: the access token was revoked or has expired."""
+
+    def __init__(self):
+        super().__init__(status_code=401, detail="Google rejected the access token")
+
+
+def utf16_len(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+class RangeRun:
+    """
+    Builds one request per run of touching ranges that share a key, instead of
+    one per range. make(key, start, end) turns a finished run into a request.
+    """
+
+    def __init__(self, make, gap: int = 0):
+        self.make = make
+        self.gap = gap  # How far apart ranges may be and still be merged
+        self.requests = []
+        self.run = None  # [key, start, end]
+
+    def add(self, key, start: int, end: int):
+        run = self.run
+        if run and run[0] == key and start <= run[2] + self.gap:
+            run[2] = max(run[2], end)
+            return
+        self.flush()
+        self.run = [key, start, end]
+
+    def flush(self):
+        if self.run:
+            self.requests.append(self.make(*self.run))
+            self.run = None
+
+
+def paragraph_style_request(style: str, start: int, end: int) -> dict:
+    return {
+        "updateParagraphStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "paragraphStyle": {"namedStyleType": style},
+            "fields": "namedStyleType",
+        }
+    }
+
+
+def bullets_request(preset: str, start: int, end: int) -> dict:
+    return {
+        "createParagraphBullets": {
+            "range": {"startIndex": start, "endIndex": end},
+            "bulletPreset": preset,
+        }
+    }
+
+
+def text_style_request(field: str, start: int, end: int) -> dict:
+    return {
+        "updateTextStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "textStyle": {field: True},
+            "fields": field,
+        }
+    }
+
+
+def roadmap_paragraphs(structure: dict, done=frozenset()):
+    """(text, paragraph style, bullet preset, struck through) in document order."""
+    if structure["title"]:
+        yield structure["title"], TITLE_STYLE, None, False
+    for module in structure["modules"]:
+        if module["title"]:
+            yield module["title"], MODULE_STYLE, None, False
+        for topic in module["topics"]:
+            yield topic["title"], None, TOPIC_BULLETS, topic["id"] in done
+
+
+def compile_roadmap(structure: dict, done=frozenset(), start_index: int = 1):
+    """
+    batchUpdate requests that write the roadmap into an empty document: the
+    title, module headings and topics as a checklist, with the topic ids in
+    done struck through. Text comes first and nothing after it moves text, so
+    every index refers to the text as inserted.
+    """
+    max_insert = settings.GOOGLE_DOCS_BATCH_MAX_BYTES // 2
+    inserts = []
+    pending = []  # Paragraphs not yet in an insertText
+    pending_size = 0
+
+    paragraph_styles = RangeRun(paragraph_style_request)
+    bullets = RangeRun(bullets_request)
+    # Done topics in a row are one newline apart; strike it through too
+    struck = RangeRun(text_style_request, gap=1)
+
+    index = start_index
+    for text, style, preset, strike in roadmap_paragraphs(structure, done):
+        end = index + utf16_len(text)
+
+        # Paragraph ranges include the newline, so consecutive ones touch
+        if style:
+            paragraph_styles.add(style, index, end + 1)
+        if preset:
+            bullets.add(preset, index, end + 1)
+        if strike and end > index:
+            struck.add("strikethrough", index, end)
+
+        paragraph = text + "\n"
+        size = len(json.dumps(paragraph))
+        if pending and pending_size + size > max_insert:
+            inserts.append("".join(pending))
+            pending, pending_size = [], 0
+        pending.append(paragraph)
+        pending_size += size
+        index = end + 1
+
+    if pending:
+        inserts.append("".join(pending))
+    for run in (paragraph_styles, bullets, struck):
+        run.flush()
+
+    return [
+        {"insertText": {"endOfSegmentLocation": {}, "text": text}} for text in inserts
+    ] + [
+        request
+        for run in (paragraph_styles, bullets, struck)
+        for request in run.requests
+    ]
+
+
+def batch_requests(
+    doc_requests: list[dict],
+    max_requests: int | None = None,
+    max_bytes: int | None = None,
+) -> list[list[dict]]:
+    """Splits requests, in order, into batchUpdate bodies under both limits."""
+    max_requests = max_requests or settings.GOOGLE_DOCS_BATCH_MAX_REQUESTS
+    max_bytes = max_bytes or settings.GOOGLE_DOCS_BATCH_MAX_BYTES
+    batches = []
+    batch = []
+    size = 0
+    for request in doc_requests:
+        request_size = len(json.dumps(request)) + 1
+        if batch and (len(batch) >= max_requests or size + request_size > max_bytes):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(request)
+        size += request_size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def docs_post(url: str, headers: dict, body: dict) -> requests.Response:
+    try:
+        return docs_session.post(
+            url,
+            headers=headers,
+            json=body,
+            timeout=(
+                settings.GOOGLE_DOCS_CONNECT_TIMEOUT,
+                settings.GOOGLE_DOCS_TIMEOUT,
+            ),
+        )
+    except requests.Timeout:
+        raise HTTPException(status_code=502, detail="Google Docs API timed out")
+
+
+def create_google_doc(
+    access_token: str, title: str | None, structure: dict, done=frozenset()
+) -> str:
+    """
+    Creates a Google Doc holding the roadmap as a checklist, with the topic ids
+    in done struck through, and returns its id. Raises GoogleTokenRejected if
+    the token is refused before anything was created.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    data = {"title": f"Roadmap: {title if title else 'AI Roadmap'}"}
+    response = docs_post(DOCS_API_URL, headers, data)
+
+    if response.status_code == 401:
+        raise GoogleTokenRejected()
+    if response.status_code != 200:
+        error_detail = str(response.content)
+        raise HTTPException(status_code=400, detail=error_detail)
+
+    document_id = response.json().get("documentId")
+
+    content_url = f"{DOCS_API_URL}/{document_id}:batchUpdate"
+    # Sequentially: later batches style text inserted by earlier ones
+    for batch in batch_requests(compile_roadmap(structure, done)):
+        content_response = docs_post(content_url, headers, {"requests": batch})
+        if content_response.status_code != 200:
+            print("Google Docs API Error:", content_response.text)
+            raise HTTPException(
+                status_code=400, detail="Failed to insert roadmap content"
+            )
+    return document_id
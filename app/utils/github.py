@@ -1,7 +1,14 @@
 import requests
 import base64
+import hashlib
+import threading
+import time
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from app.settings import settings
+from app.utils.retry import backoff_delay
 
-GITHUB_API_BASE_URL = "https://api.github.com"
+GITHUB_API_BASE_URL = settings.GITHUB_API_BASE_URL
 
 
 def create_github_repo(access_token: str, repo_name: str, private: bool = False) -> str:
@@ -66,11 +73,337 @@ def get_github_access_token(code: str):
     url = "https://github.com/login/oauth/access_token"
     headers = {"Accept": "application/json"}
     data = {
-        "client_id": GITHUB_CLIENT_ID,
-        "client_secret": GITHUB_CLIENT_SECRET,
+        "client_id": settings.GITHUB_CLIENT_ID,
+        "client_secret": settings.GITHUB_CLIENT_SECRET,
         "code": code,
-        "redirect_uri": GITHUB_REDIRECT_URI,
+        "redirect_uri": settings.GITHUB_REDIRECT_URI,
     }
 
     response = requests.post(url, headers=headers, data=data)
     return response.json().get("access_token")
+
+
+class GitHubError(Exception):
+    """A GitHub API call answered with an unexpected status."""
+
+    def __init__(self, message: str, response: requests.Response | None = None):
+        super().__init__(message)
+        self.response = response
+        self.status_code = response.status_code if response is not None else None
+
+    @property
+    def transient(self) -> bool:
+        """Worth retrying later: GitHub-side errors, as opposed to e.g. a bad token."""
+        return self.status_code is None or self.status_code >= 500
+
+
+class GitHubRateLimited(GitHubError):
+    """GitHub asked us to back off for retry_after seconds."""
+
+    def __init__(
+        self, message: str, retry_after: float, response: requests.Response | None
+    ):
+        super().__init__(message, response)
+        self.retry_after = retry_after
+
+    @property
+    def transient(self) -> bool:
+        return True
+
+
+def rate_limit_wait(response: requests.Response) -> float | None:
+    """
+    Seconds a response tells us to wait before calling again: Retry-After, or
+    until X-RateLimit-Reset once X-RateLimit-Remaining is 0. None if it isn't
+    rate limited.
+    """
+    if response.status_code not in (403, 429):
+        return None
+    if "Retry-After" in response.headers:
+        return float(response.headers["Retry-After"])
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = float(response.headers.get("X-RateLimit-Reset", time.time() + 60))
+        return max(reset - time.time(), 0)
+    if "rate limit" in response.text.lower():
+        return 60  # Secondary limits without headers: GitHub says wait a minute
+    return None  # A plain 403, e.g. missing scopes
+
+
+def token_digest(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+EXPORT_STEPS = ("login", "repository", "tree", "commit")
+
+
+class GitHubExporter:
+    """
+    Writes a set of files to a user's repository as a single commit through the
+    Git Data API (ref -> tree -> commit -> ref update), over one pooled
+    keep-alive session. Blocking: call it from a thread.
+    """
+
+    def __init__(self, base_url: str = GITHUB_API_BASE_URL):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=settings.GITHUB_MAX_CONNECTIONS
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        # Logins keyed by token digest, so the tokens themselves aren't kept
+        self.logins = TTLCache(
+            maxsize=settings.GITHUB_LOGIN_CACHE_MAXSIZE,
+            ttl=settings.GITHUB_LOGIN_CACHE_TTL,
+        )
+        # Token digest -> time its rate limit resets, once it is used up
+        self.rate_limit_resets = TTLCache(
+            maxsize=settings.GITHUB_LOGIN_CACHE_MAXSIZE, ttl=60 * 60
+        )
+        self.lock = threading.Lock()
+        # Per thread: the monotonic time the running export must finish by
+        self.local = threading.local()
+
+    def close(self):
+        self.session.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        access_token: str,
+        expected: tuple[int, ...] = (200,),
+        **kwargs,
+    ) -> requests.Response:
+        """
+        One API call. 5xx responses, connection errors and rate limits are
+        retried with jittered exponential backoff, as long as the wait stays
+        under GITHUB_MAX_RETRY_WAIT; beyond that GitHubRateLimited tells the
+        caller how long to back off.
+        """
+        digest = token_digest(access_token)
+        for attempt in range(1, settings.GITHUB_MAX_RETRIES + 2):
+            with self.lock:
+                wait = self.rate_limit_resets.get(digest, 0) - time.time()
+            if wait > 0:
+                # Known to be used up; don't spend a call finding out again
+                error = GitHubRateLimited("GitHub rate limit exhausted", wait, None)
+                if wait > settings.GITHUB_MAX_RETRY_WAIT:
+                    raise error
+                self.sleep(wait, error)
+
+            timeout, left = settings.GITHUB_TIMEOUT, self.time_left()
+            if left is not None:
+                if left <= 0:
+                    raise GitHubError(f"GitHub {method} {path}: export ran out of time")
+                timeout = min(timeout, left)
+            try:
+                response = self.session.request(
+                    method,
+                    f"{self.base_url}{path}",
+                    headers={"Authorization": f"token {access_token}"},
+                    timeout=timeout,
+                    **kwargs,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, wait = GitHubError(f"GitHub {method} {path} failed: {e}"), 0
+            else:
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    with self.lock:
+                        self.rate_limit_resets[digest] = float(
+                            response.headers.get("X-RateLimit-Reset", 0)
+                        )
+                if response.status_code in expected:
+                    return response
+
+                message = f"GitHub {method} {path} failed with {response.status_code}"
+                wait = rate_limit_wait(response)
+                if wait is not None:
+                    error = GitHubRateLimited(message, wait, response)
+                else:
+                    error, wait = GitHubError(message, response), 0
+
+            if not error.transient or attempt > settings.GITHUB_MAX_RETRIES:
+                raise error
+            delay = max(wait, backoff_delay(settings.GITHUB_RETRY_BACKOFF, attempt))
+            if delay > settings.GITHUB_MAX_RETRY_WAIT:
+                raise error
+            self.sleep(delay, error)
+
+    def time_left(self) -> float | None:
+        """Seconds until this thread's export deadline, None without one."""
+        deadline = getattr(self.local, "deadline", None)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def sleep(self, seconds: float, error: GitHubError):
+        """Waits before a retry, or raises error if that would pass the deadline."""
+        left = self.time_left()
+        if left is not None and seconds >= left:
+            raise error
+        time.sleep(seconds)
+
+    def remember_login(self, access_token: str, login: str):
+        with self.lock:
+            self.logins[token_digest(access_token)] = login
+
+    def get_login(self, access_token: str) -> str:
+        with self.lock:
+            login = self.logins.get(token_digest(access_token))
+        if login is None:
+            login = self.request("GET", "/user", access_token).json()["login"]
+            self.remember_login(access_token, login)
+        return login
+
+    def ensure_repo(self, access_token: str, owner: str, name: str) -> str:
+        """Creates the repository unless it exists; returns its default branch."""
+        response = self.request(
+            "POST",
+            "/user/repos",
+            access_token,
+            expected=(201, 422),
+            json={
+                "name": name,
+                "description": "AI-generated roadmap",
+                "private": False,
+                # Starts with a commit, so the Git Data API works right away
+                "auto_init": True,
+            },
+        )
+        if response.status_code == 422:  # Already exists
+            response = self.request("GET", f"/repos/{owner}/{name}", access_token)
+        return response.json()["default_branch"]
+
+    def get_head(self, access_token: str, repo: str, branch: str) -> str | None:
+        """Sha of the branch's head commit, or None if the repository is empty."""
+        response = self.request(
+            "GET",
+            f"{repo}/git/ref/heads/{branch}",
+            access_token,
+            expected=(200, 404, 409),
+        )
+        if response.status_code != 200:
+            return None
+        return response.json()["object"]["sha"]
+
+    def initialize(
+        self, access_token: str, repo: str, branch: str, path: str, content: str
+    ) -> str:
+        """
+        The Git Data API answers 409 on an empty repository (e.g. one created
+        without auto_init), so the first file goes in through the contents API.
+        """
+        response = self.request(
+            "PUT",
+            f"{repo}/contents/{path}",
+            access_token,
+            expected=(201,),
+            json={
+                "message": f"Added {path}",
+                "content": base64.b64encode(content.encode()).decode(),
+                "branch": branch,
+            },
+        )
+        return response.json()["commit"]["sha"]
+
+    def export(
+        self,
+        access_token: str,
+        repo_name: str,
+        files: dict[str, str],
+        message: str,
+        progress=None,
+        deadline: float | None = None,
+    ) -> str:
+        """
+        Writes files ({path: content}) to repo_name in one commit, creating the
+        repository if needed, and returns the repository's URL. Files already in
+        the repository that aren't in files are kept.
+
+        progress, if given, is called with each of EXPORT_STEPS as it starts.
+        Running an export again is safe: an unchanged tree makes no commit.
+
+        deadline (a time.monotonic() value) bounds the whole export: no request
+        starts, waits for a retry or reads for longer than what is left of it.
+        The caller's own timeout can't stop a thread, this can.
+        """
+        self.local.deadline = deadline
+        try:
+            return self.write_files(access_token, repo_name, files, message, progress)
+        finally:
+            self.local.deadline = None
+
+    def write_files(
+        self,
+        access_token: str,
+        repo_name: str,
+        files: dict[str, str],
+        message: str,
+        progress=None,
+    ) -> str:
+        report = progress or (lambda step: None)
+
+        report("login")
+        owner = self.get_login(access_token)
+        report("repository")
+        branch = self.ensure_repo(access_token, owner, repo_name)
+        repo = f"/repos/{owner}/{repo_name}"
+
+        report("tree")
+        parent = self.get_head(access_token, repo, branch)
+        if parent is None:
+            path, content = next(iter(files.items()))
+            parent = self.initialize(access_token, repo, branch, path, content)
+
+        base_tree = self.request(
+            "GET", f"{repo}/git/commits/{parent}", access_token
+        ).json()["tree"]["sha"]
+        tree = self.request(
+            "POST",
+            f"{repo}/git/trees",
+            access_token,
+            expected=(201,),
+            json={
+                "base_tree": base_tree,
+                "tree": [
+                    {"path": path, "mode": "100644", "type": "blob", "content": content}
+                    for path, content in files.items()
+                ],
+            },
+        ).json()["sha"]
+
+        report("commit")
+        if tree != base_tree:  # Nothing to commit when the files are unchanged
+            commit = self.request(
+                "POST",
+                f"{repo}/git/commits",
+                access_token,
+                expected=(201,),
+                json={"message": message, "tree": tree, "parents": [parent]},
+            ).json()["sha"]
+            self.request(
+                "PATCH",
+                f"{repo}/git/refs/heads/{branch}",
+                access_token,
+                json={"sha": commit},
+            )
+        return f"https://github.com/{owner}/{repo_name}"
+
+
+def roadmap_repo_name(title: str | None) -> str:
+    return f"{title.replace(' ', '-').lower()}-roadmap" if title else "ai-roadmap"
+
+
+def roadmap_files(repo_name: str, content: str, structure: dict) -> dict[str, str]:
+    """The files a roadmap is exported as, by path."""
+    modules = "".join(
+        f"- [{module['title']}](./ROADMAP.md#L{module['line']}) "
+        f"({len(module['topics'])} topics)\n"
+        for module in structure["modules"]
+        if module["title"]
+    )
+    readme = f"""# {structure["title"] or repo_name}\n\n## Roadmap\n\n{modules}\nSee [ROADMAP.md](./ROADMAP.md) for details. \n\nGenerated by AI Roadmap Generator\n"""
+    return {"README.md": readme, "ROADMAP.md": content}
+
+
+github_exporter = GitHubExporter()
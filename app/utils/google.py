@@ -1,79 +1,124 @@
-from authlib.integrations.starlette_client import OAuth
+from cachetools import TLRUCache, TTLCache
+from app.database import AsyncSessionLocal
+from app.models import User
 from app.settings import settings
+from app.utils.metrics import metrics
+from app.utils.singleflight import SingleFlight
+from app.utils.user import invalidate_user
+from datetime import datetime, timezone
+from sqlalchemy import select
+import asyncio
+import httpx
+import json
+import os
 import requests
+import time
 
-oauth = OAuth()
-
-metadata_url = "https://accounts.google.com/.well-known/openid-configuration"
-metadata = requests.get(metadata_url).json()
-
-oauth.register(
-    name="google",
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    authorize_url="https://accounts.google.com/o/oauth2/auth",
-    access_token_url="https://oauth2.googleapis.com/token",
-    redirect_url=settings.GOOGLE_REDIRECT_URI,
-    userinfo_endpoint="https://openidconnect.googleapis.com/v1/userinfo",
-    client_kwargs={
-        "scope": "openid email profile https://www.googleapis.com/auth/documents"
-    },
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
-)
+GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid-configuration"
+GOOGLE_METADATA_CACHE_FILE = "google-openid-configuration.json"
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_TOKEN_INFO_URL = "https://oauth2.googleapis.com/tokeninfo"
+
+oauth = None
+google_metadata = SingleFlight("google_metadata")
 
 
-def is_google_token_valid(access_token: str) -> bool:
+def get_oauth():
     """
-    Check if a Google OAuth token is expired or valid.
+    The OAuth registry, built on first use. Never touches the network: the
+    Google discovery document is attached by get_google_client.
     """
+    global oauth
+    if oauth is None:
+        # Authlib (and its crypto stack) is only needed for Google sign-in
+        from authlib.integrations.starlette_client import OAuth
+
+        oauth = OAuth()
+        oauth.register(
+            name="google",
+            client_id=settings.GOOGLE_CLIENT_ID,
+            client_secret=settings.GOOGLE_CLIENT_SECRET,
+            authorize_url="https://accounts.google.com/o/oauth2/auth",
+            access_token_url="https://oauth2.googleapis.com/token",
+            redirect_url=settings.GOOGLE_REDIRECT_URI,
+            userinfo_endpoint="https://openidconnect.googleapis.com/v1/userinfo",
+            client_kwargs={
+                "scope": "openid email profile https://www.googleapis.com/auth/documents"
+            },
+            server_metadata_url=GOOGLE_DISCOVERY_URL,
+        )
+    return oauth
+
+
+def metadata_cache_path() -> str:
+    return os.path.join(settings.OAUTH_METADATA_CACHE_DIR, GOOGLE_METADATA_CACHE_FILE)
+
+
+def read_cached_metadata() -> dict | None:
+    """The on-disk discovery document (with its _loaded_at time), if any."""
     try:
-        # Decode the JWT without verification to check `exp`
-        token_payload = jwt.decode(access_token, options={"verify_signature": False})
+        with open(metadata_cache_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-        # Get expiration time (`exp`) from token
-        exp_timestamp = token_payload.get("exp")
-        if not exp_timestamp:
-            return False  # No expiration timestamp found
 
-        # Convert `exp` to datetime
-        exp_time = datetime.fromtimestamp(exp_timestamp, tz=timezone.utc)
+def write_cached_metadata(metadata: dict):
+    path = metadata_cache_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write then rename, so other workers never read a half-written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(metadata, f)
+    os.replace(temp_path, path)
 
-        # Compare with current time
-        return exp_time > datetime.now(timezone.utc)
 
-    except jwt.DecodeError:
-        return False  # Invalid token
-    except Exception as e:
-        print(f"Error checking token: {e}")
-        return False  # Handle unexpected errors
+def is_fresh(metadata: dict | None) -> bool:
+    if not metadata:
+        return False
+    return time.time() - metadata.get("_loaded_at", 0) < settings.OAUTH_METADATA_TTL
 
 
-def refresh_google_token(user, db):
+async def load_google_metadata() -> dict | None:
     """
-    Refreshes a Google OAuth access token using a refresh token.
+    Google's OpenID discovery document: the disk copy while it is fresh,
+    otherwise fetched (and written back to disk). Falls back to a stale disk
+    copy when Google can't be reached.
     """
+    cached = read_cached_metadata()
+    if is_fresh(cached):
+        return cached
 
-    GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
     try:
-        payload = {
-            "client_id": settings.GOOGLE_CLIENT_ID,
-            "client_secret": settings.GOOGLE_CLIENT_SECRET,
-            "refresh_token": refresh_token,
-            "grant_type": "refresh_token",
-        }
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(GOOGLE_DISCOVERY_URL)
+            response.raise_for_status()
+            metadata = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Could not fetch Google OpenID configuration: {e}")
+        return cached
 
-        response = requests.post(GOOGLE_TOKEN_URL, data=payload)
-        response_data = response.json()
+    metadata["_loaded_at"] = time.time()
+    try:
+        write_cached_metadata(metadata)
+    except OSError as e:
+        print(f"Could not cache Google OpenID configuration: {e}")
+    return metadata
 
-        if response.status_code == 200:
-            return response_data  # ✅ Returns new access token and expiration info
 
-        print(f"Token refresh failed: {response_data}")
-        return None  # Refresh failed
+async def refresh_google_metadata():
+    """Loads the discovery document into the OAuth client ahead of the first login."""
+    metadata = await google_metadata.do("google", load_google_metadata)
+    if metadata:
+        get_oauth().google.server_metadata.update(metadata)
 
-    except requests.RequestException as e:
-        print(f"Request error: {e}")
-        return None
+
+async def get_google_client():
+    """The Google OAuth client, with its discovery document loaded."""
+    google = get_oauth().google
+    if not is_fresh(google.server_metadata):
+        await refresh_google_metadata()
+    return google
 
 
 def revoke_token(access_token):
@@ -83,15 +128,183 @@ def revoke_token(access_token):
     return response.status_code == 200
 
 
-def is_google_token_active(access_token: str) -> bool:
+def to_timestamp(value: datetime | None) -> float | None:
+    """Epoch seconds for a naive UTC datetime column."""
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+def from_timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+
+async def fetch_token_expiry(access_token: str) -> float | None:
+    """When an access token expires according to Google's tokeninfo, None if invalid."""
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(
+                GOOGLE_TOKEN_INFO_URL, params={"access_token": access_token}
+            )
+    except httpx.HTTPError as e:
+        print(f"Could not check Google token: {e}")
+        return None
+    if response.status_code != 200:
+        return None
+    return time.time() + int(response.json().get("expires_in", 0))
+
+
+async def refresh_google_token(refresh_token: str) -> dict | None:
     """
-    Verify the validity of a Google OAuth access token by calling Google's token info endpoint.
+    Exchanges a refresh token for a new access token. Returns Google's token
+    response (access_token, expires_in, ...) or None if the refresh failed.
     """
+    payload = {
+        "client_id": settings.GOOGLE_CLIENT_ID,
+        "client_secret": settings.GOOGLE_CLIENT_SECRET,
+        "refresh_token": refresh_token,
+        "grant_type": "refresh_token",
+    }
     try:
-        GOOGLE_TOKEN_INFO_URL = "https://oauth2.googleapis.com/tokeninfo"
-        response = requests.get(
-            GOOGLE_TOKEN_INFO_URL, params={"access_token": access_token}
-        )
-        return response.status_code == 200  # If response is 200, token is valid
-    except requests.RequestException:
-        return False  # Request failed, assume token is invalid
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.post(GOOGLE_TOKEN_URL, data=payload)
+    except httpx.HTTPError as e:
+        print(f"Request error: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"Token refresh failed: {response.text}")
+        return None
+    return response.json()
+
+
+# user id -> (access token, expires at). Entries drop out GOOGLE_TOKEN_EXPIRY_MARGIN
+# before the token expires, so a hit is a token that's good for at least that long.
+google_tokens = TLRUCache(
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttu=lambda _, value, now: value[1] - settings.GOOGLE_TOKEN_EXPIRY_MARGIN,
+    timer=time.time,
+)
+# Users who used their Google token recently; the background refresher keeps
+# their tokens fresh so they never wait for a refresh
+active_google_users = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.GOOGLE_TOKEN_ACTIVE_WINDOW
+)
+google_token_refresh = SingleFlight("google_token_refresh")
+
+
+def forget_google_token(user_id: int):
+    """Call after storing a new Google token for a user."""
+    google_tokens.pop(user_id, None)
+
+
+async def refresh_user_google_token(user_id: int) -> tuple[str, float] | None:
+    """Refreshes and stores a user's access token; (token, expires at) or None."""
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if not user or not user.google_refresh_token:
+            return None
+        data = await refresh_google_token(user.google_refresh_token)
+        if not data:
+            return None
+
+        expires_at = time.time() + int(data.get("expires_in", 3600))
+        user.google_oauth_token = data["access_token"]
+        user.google_token_expires_at = from_timestamp(expires_at)
+        if data.get("refresh_token"):  # Google may rotate it
+            user.google_refresh_token = data["refresh_token"]
+        await db.commit()
+        email = user.email
+
+    invalidate_user(email)  # CurrentUser carries the token
+    google_tokens[user_id] = (data["access_token"], expires_at)
+    return data["access_token"], expires_at
+
+
+async def load_google_token(user_id: int) -> tuple[str, float] | None:
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, user_id)
+        if not user or not user.google_oauth_token:
+            return None
+        access_token = user.google_oauth_token
+        expires_at = to_timestamp(user.google_token_expires_at)
+        has_refresh_token = bool(user.google_refresh_token)
+
+        if expires_at is None:
+            # Stored before expiry times were; ask Google once and remember
+            expires_at = await fetch_token_expiry(access_token)
+            if expires_at is not None:
+                user.google_token_expires_at = from_timestamp(expires_at)
+                await db.commit()
+
+    if expires_at and expires_at - settings.GOOGLE_TOKEN_EXPIRY_MARGIN > time.time():
+        google_tokens[user_id] = (access_token, expires_at)
+        return access_token, expires_at
+    if has_refresh_token:
+        return await refresh_user_google_token(user_id)
+    return None
+
+
+async def get_google_access_token(user_id: int) -> str | None:
+    """
+    A Google access token for the user that is valid for at least
+    GOOGLE_TOKEN_EXPIRY_MARGIN, refreshing it if needed; None if there is none
+    (the user has to sign in with Google again). Cached until near expiry, so
+    the usual case costs no database query and no call to Google.
+    """
+    active_google_users[user_id] = True
+    cached = google_tokens.get(user_id)
+    if cached is not None:
+        metrics["google_token_cache_hit"] += 1
+        return cached[0]
+
+    metrics["google_token_cache_miss"] += 1
+    # Concurrent misses (and the background refresher) share one load/refresh
+    token = await google_token_refresh.do(str(user_id), load_google_token, user_id)
+    return token[0] if token else None
+
+
+async def renew_google_access_token(user_id: int) -> str | None:
+    """
+    For a token Google rejected before its expiry (revoked, or the user signed
+    out elsewhere): drops the cached one and refreshes it. None if that fails.
+    """
+    forget_google_token(user_id)
+    token = await google_token_refresh.do(
+        str(user_id), refresh_user_google_token, user_id
+    )
+    return token[0] if token else None
+
+
+async def refresh_google_tokens():
+    """
+    Runs for the app's lifetime: refreshes the tokens of recently active users
+    GOOGLE_TOKEN_REFRESH_AHEAD before they expire. Concurrent refreshes of the
+    same user (here or from a request) share one call to Google.
+    """
+    while True:
+        await asyncio.sleep(settings.GOOGLE_TOKEN_REFRESH_INTERVAL)
+        deadline = time.time() + settings.GOOGLE_TOKEN_REFRESH_AHEAD
+        due = []
+        for user_id in list(active_google_users):
+            cached = google_tokens.get(user_id)
+            if cached is None or cached[1] <= deadline:
+                due.append(user_id)
+        if not due:
+            continue
+        # Users without a refresh token can't be refreshed, don't load them
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(User.id).where(
+                        User.id.in_(due), User.google_refresh_token.is_not(None)
+                    )
+                )
+                user_ids = result.scalars().all()
+        except Exception as e:
+            print(f"Could not load users for Google token refresh: {e}")
+            continue
+        for user_id in user_ids:
+            try:
+                await google_token_refresh.do(
+                    str(user_id), refresh_user_google_token, user_id
+                )
+            except Exception as e:
+                print(f"Google token refresh for user {user_id} failed: {e}")
@@ -0,0 +1,378 @@
+import asyncio
+import time
+import weakref
+from datetime import datetime, timedelta
+import anyio
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import AsyncSessionLocal
+from app.models import Job, User
+from app.repositories import RoadmapRepository
+from app.settings import settings
+from app.utils.github import (
+    EXPORT_STEPS,
+    GitHubError,
+    GitHubRateLimited,
+    github_exporter,
+    roadmap_files,
+    roadmap_repo_name,
+    token_digest,
+)
+from app.utils.llm import generate_roadmap_content
+from app.utils.progress import render_checklist
+from app.utils.retry import backoff_delay
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+GENERATE_ROADMAP_JOB = "generate_roadmap"
+GITHUB_EXPORT_JOB = "github_export"
+
+
+class RetryJob(Exception):
+    """Raised by a handler to be retried no sooner than delay seconds from now."""
+
+    def __init__(self, message: str, delay: float):
+        super().__init__(message)
+        self.delay = delay
+
+
+class FailJob(Exception):
+    """Raised by a handler for errors that retrying won't fix."""
+
+
+class DatabaseJobQueue:
+    """
+    Uses the jobs table itself as the queue, so jobs run anywhere the app
+    database does (SQLite locally, no Redis required).
+
+    A lease pushes the job's visible_at forward; if the worker dies the job
+    becomes claimable again once the visibility timeout passes.
+    """
+
+    name = "database"
+
+    async def push(self, job_id: str, delay: float = 0):
+        pass  # The row's visible_at already says when it can run
+
+    async def lease(self, visibility_timeout: float) -> str | None:
+        async with AsyncSessionLocal() as db:
+            now = datetime.utcnow()
+            candidates = await db.scalars(
+                select(Job.id)
+                .where(Job.status.in_([JOB_QUEUED, JOB_RUNNING]), Job.visible_at <= now)
+                .order_by(Job.visible_at)
+                .limit(5)
+            )
+            for job_id in candidates.all():
+                # Conditional update so only one worker wins the lease
+                result = await db.execute(
+                    update(Job)
+                    .where(
+                        Job.id == job_id,
+                        Job.status.in_([JOB_QUEUED, JOB_RUNNING]),
+                        Job.visible_at <= now,
+                    )
+                    .values(visible_at=now + timedelta(seconds=visibility_timeout))
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    return job_id
+            return None
+
+    async def ack(self, job_id: str):
+        pass  # Finished jobs are never leased again
+
+    async def close(self):
+        pass
+
+
+class RedisJobQueue:
+    """
+    Sorted set of job ids scored by the time they become visible.
+
+    Leasing atomically takes the first visible id and re-scores it to
+    now + visibility timeout, so an unacknowledged job reappears by itself.
+    """
+
+    name = "redis"
+    key = "roadmap:jobs"
+
+    LEASE_SCRIPT = """
+    local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+    if #ids == 0 then
+        return nil
+    end
+    redis.call('ZADD', KEYS[1], ARGV[2], ids[1])
+    return ids[1]
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.lease_script = self.redis.register_script(self.LEASE_SCRIPT)
+
+    async def push(self, job_id: str, delay: float = 0):
+        await self.redis.zadd(self.key, {job_id: time.time() + delay})
+
+    async def lease(self, visibility_timeout: float) -> str | None:
+        now = time.time()
+        job_id = await self.lease_script(
+            keys=[self.key], args=[now, now + visibility_timeout]
+        )
+        return job_id.decode() if job_id else None
+
+    async def ack(self, job_id: str):
+        await self.redis.zrem(self.key, job_id)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+async def create_job_queue():
+    """Returns the configured queue, falling back to the database without Redis."""
+    backend = settings.JOB_QUEUE_BACKEND
+    if backend in ("redis", "auto"):
+        queue = None
+        try:
+            queue = RedisJobQueue(settings.REDIS_URL)
+            await queue.redis.ping()
+            return queue
+        except Exception as e:
+            if backend == "redis":
+                raise
+            if queue is not None:
+                await queue.close()
+            print(f"Redis job queue unavailable ({e}), using the database queue")
+    return DatabaseJobQueue()
+
+
+async def run_generation_job(job: Job, db: AsyncSession) -> dict:
+    payload = job.payload
+    content, cached = await generate_roadmap_content(
+        payload["topic"],
+        payload["level"],
+        bypass_cache=payload.get("bypass_cache", False),
+    )
+    # Committed together with the job's status
+    roadmap = await RoadmapRepository(db).create(
+        job.user_id, f"{payload['topic']} {payload['level']} Roadmap", content
+    )
+    return {"roadmap": roadmap.id, "cached": cached}
+
+
+async def set_job_progress(job_id: str, progress: dict):
+    """Stores a running job's progress right away, outside the job's transaction."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(Job).where(Job.id == job_id).values(progress=progress))
+        await db.commit()
+
+
+# Per-token export slots. Entries go away with the last export holding them.
+github_export_slots = weakref.WeakValueDictionary()
+
+
+def github_export_slot(access_token: str) -> asyncio.Semaphore:
+    digest = token_digest(access_token)
+    slot = github_export_slots.get(digest)
+    if slot is None:
+        slot = asyncio.Semaphore(settings.GITHUB_EXPORTS_PER_TOKEN)
+        github_export_slots[digest] = slot
+    return slot
+
+
+async def run_github_export_job(job: Job, db: AsyncSession) -> dict:
+    # The token is read now rather than stored in the payload
+    user = await db.get(User, job.user_id)
+    if not user or not user.github_token:
+        raise FailJob("GitHub not linked")
+    roadmap = await RoadmapRepository(db).get_for_user(
+        job.payload["roadmap_id"], job.user_id, include_content=True
+    )
+    if not roadmap:
+        raise FailJob("Roadmap not found")
+
+    job_id = job.id
+    repo_name = roadmap_repo_name(roadmap.title)
+    content = render_checklist(roadmap.content, roadmap.structure, roadmap.progress)
+    files = roadmap_files(repo_name, content, roadmap.structure)
+
+    def progress(step: str):
+        # Called from the export's worker thread
+        data = {"step": step, "step_number": EXPORT_STEPS.index(step) + 1}
+        data["steps"] = len(EXPORT_STEPS)
+        anyio.from_thread.run(set_job_progress, job_id, data)
+
+    # Exports with the same token are limited per process, so one user's
+    # exports can't use up their rate limit (or the worker pool) all at once
+    async with github_export_slot(user.github_token):
+        try:
+            repo_url = await run_in_threadpool(
+                github_exporter.export,
+                user.github_token,
+                repo_name,
+                files,
+                "Update roadmap",
+                progress,
+                time.monotonic() + settings.GITHUB_EXPORT_TIMEOUT,
+            )
+        except GitHubRateLimited as e:
+            raise RetryJob(str(e), e.retry_after)
+        except GitHubError as e:
+            if not e.transient:
+                raise FailJob(str(e))
+            raise
+    return {"repo_url": repo_url, "roadmap": roadmap.id}
+
+
+JOB_HANDLERS = {
+    GENERATE_ROADMAP_JOB: run_generation_job,
+    GITHUB_EXPORT_JOB: run_github_export_job,
+}
+
+
+class JobWorkerPool:
+    """Runs JOB_WORKER_CONCURRENCY workers in this process, from the app lifespan."""
+
+    def __init__(self):
+        self.queue = None
+        self.tasks = []
+
+    async def start(self):
+        if self.queue is None:
+            self.queue = await create_job_queue()
+        self.tasks = [
+            asyncio.create_task(self.run_worker())
+            for _ in range(settings.JOB_WORKER_CONCURRENCY)
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.queue is not None:
+            await self.queue.close()
+            self.queue = None
+
+    async def enqueue(
+        self,
+        kind: str,
+        user_id: int | None,
+        payload: dict,
+        db: AsyncSession,
+        dedupe_key: str | None = None,
+    ) -> Job:
+        """
+        Queues a job. With a dedupe_key, an unfinished job with the same key is
+        returned instead of queueing a duplicate.
+        """
+        if dedupe_key:
+            existing = await db.scalar(select(Job).where(Job.dedupe_key == dedupe_key))
+            if existing:
+                return existing
+
+        job = Job(
+            kind=kind,
+            user_id=user_id,
+            payload=payload,
+            status=JOB_QUEUED,
+            dedupe_key=dedupe_key,
+        )
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # A concurrent request queued the same job first
+            await db.rollback()
+            existing = await db.scalar(select(Job).where(Job.dedupe_key == dedupe_key))
+            if not existing:
+                raise
+            return existing
+
+        try:
+            if self.queue is None:
+                self.queue = await create_job_queue()
+            await self.queue.push(job.id)
+        except Exception as e:
+            # No worker would ever lease it, and its dedupe_key would keep the
+            # same work from being queued again; fail it instead
+            job.status = JOB_FAILED
+            job.error = f"Could not queue the job: {e}"
+            job.dedupe_key = None
+            await db.commit()
+            raise
+        return job
+
+    async def run_worker(self):
+        while True:
+            try:
+                job_id = await self.queue.lease(settings.JOB_VISIBILITY_TIMEOUT)
+            except Exception as e:
+                print(f"Job queue error: {e}")
+                job_id = None
+
+            if job_id is None:
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+
+            try:
+                await self.process(job_id)
+            except Exception as e:
+                # The lease expires and the job is picked up again
+                print(f"Job {job_id} crashed: {e}")
+
+    async def process(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(Job, job_id)
+            if not job or job.status in FINISHED_STATUSES:
+                await self.queue.ack(job_id)
+                return
+
+            attempts = job.attempts + 1
+            job.status = JOB_RUNNING
+            job.attempts = attempts
+            job.error = None
+            job.visible_at = datetime.utcnow() + timedelta(
+                seconds=settings.JOB_VISIBILITY_TIMEOUT
+            )
+            await db.commit()
+
+            try:
+                # Never outlive the lease, or another worker would run the job too
+                result = await asyncio.wait_for(
+                    JOB_HANDLERS[job.kind](job, db),
+                    timeout=settings.JOB_VISIBILITY_TIMEOUT,
+                )
+            except Exception as e:
+                await db.rollback()  # Expires job; only write to it from here on
+                job.error = str(e) or e.__class__.__name__
+                if isinstance(e, FailJob) or attempts >= settings.JOB_MAX_ATTEMPTS:
+                    job.status = JOB_FAILED
+                    job.dedupe_key = None
+                    await db.commit()
+                    await self.queue.ack(job_id)
+                else:
+                    delay = backoff_delay(settings.JOB_RETRY_BACKOFF, attempts)
+                    if isinstance(e, RetryJob):
+                        delay = max(delay, e.delay)
+                    job.status = JOB_QUEUED
+                    job.visible_at = datetime.utcnow() + timedelta(seconds=delay)
+                    await db.commit()
+                    await self.queue.push(job_id, delay)
+                return
+
+            job.status = JOB_SUCCEEDED
+            job.result = result
+            job.dedupe_key = None
+            await db.commit()
+            await self.queue.ack(job_id)
+
+
+job_workers = JobWorkerPool()
@@ -1,12 +1,23 @@
+import asyncio
+import hashlib
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from cachetools import TLRUCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException
 from app.settings import settings
+from app.utils.metrics import metrics
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+BCRYPT_MIN_ROUNDS = 10  # Never calibrate below this, however slow the host
 
 
 def verify_password(plain_password: str, hashed_password: str):
@@ -17,6 +28,86 @@ def get_password_hash(password: str):
     return pwd_context.hash(password)
 
 
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Returns the highest bcrypt cost whose hash takes at most target_ms here."""
+    probe_rounds = 8
+    probe = CryptContext(schemes=["bcrypt"], bcrypt__rounds=probe_rounds)
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        probe.hash("calibration password")
+        timings.append((time.perf_counter() - started) * 1000)
+    # Each extra round doubles the work
+    rounds = probe_rounds + int(math.log2(target_ms / min(timings)))
+    return max(BCRYPT_MIN_ROUNDS, min(rounds, 31))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so it never blocks the event
+    loop or starves the default threadpool. Once PASSWORD_HASH_QUEUE_LIMIT
+    operations are waiting, new ones are refused with a 503 instead of queuing
+    behind a login burst.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.pending = 0  # Only touched from the event loop
+
+    def startup(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+        if settings.BCRYPT_TARGET_MS:
+            self.executor.submit(self.calibrate)
+
+    def calibrate(self):
+        rounds = calibrate_bcrypt_rounds(settings.BCRYPT_TARGET_MS)
+        pwd_context.update(bcrypt__rounds=rounds)
+        print(f"bcrypt cost calibrated to {rounds} rounds")
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, fn, *args):
+        limit = settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT
+        if self.pending >= limit:
+            metrics["password_hash_rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many password operations, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        if self.executor is None:
+            self.startup()
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self.run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run(pwd_context.verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """(valid, new hash). The new hash is set when the stored cost is stale."""
+        return await self.run(pwd_context.verify_and_update, password, hashed_password)
+
+
+password_hasher = PasswordHasher()
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Generate JWT token for authentication."""
     to_encode = data.copy()
@@ -25,3 +116,29 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     )
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def token_expiry(key: str, claims: dict, now: float) -> float:
+    # Cached claims are dropped exactly when the token itself stops being valid
+    return claims.get("exp", now)
+
+
+# Verified claims keyed by a digest of the token, so raw bearer tokens never
+# sit in memory as dict keys. Invalid tokens are never cached.
+verified_tokens = TLRUCache(
+    maxsize=settings.JWT_CACHE_MAXSIZE, ttu=token_expiry, timer=time.time
+)
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify a JWT and return its claims, reusing earlier verifications."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        metrics["jwt_cache_hit"] += 1
+        return dict(claims)
+
+    metrics["jwt_cache_miss"] += 1
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    verified_tokens[key] = claims
+    return dict(claims)
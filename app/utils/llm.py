@@ -0,0 +1,200 @@
+import asyncio
+import httpx
+from app.database import AsyncSessionLocal
+from app.settings import settings
+from app.utils.singleflight import SingleFlight
+from app.utils.cache import get_cached_roadmap, make_cache_key, set_cached_roadmap
+
+# Bump whenever ROADMAP_PROMPT changes so cached results from the old prompt are ignored
+ROADMAP_PROMPT_VERSION = 1
+
+ROADMAP_PROMPT = """
+        Generate a structured course roadmap based on the following criteria:
+        - **Topic:** {topic} Roadmap
+        - **Level:** {level}
+        - **Format:** Strictly Markdown format with bullet points and bold headers.
+        - **Structure:**
+            - Course title (in bold)
+            - Modules (in bold) with key topics as bullet points.
+        - **Formatting Rules:**
+            - Each module must have a title in `**bold**`
+            - Key topics within modules must be in `- ` bullet points.
+            - No introduction, explanation, or additional text.
+            - Output should **only** contain the structured roadmap.
+            - No title, subtitles, or descriptions beyond the roadmap itself.
+
+        ### **Example Format:**
+            # Course Title
+            - ## Module 1: Name
+                - [ ] Topic 1 
+                - [ ] Topic 2
+
+            - ## Module 2: Name
+                - [ ] Topic 1
+                - [ ]Topic 2
+
+    """
+
+
+def build_roadmap_prompt(topic: str, level: str) -> str:
+    return ROADMAP_PROMPT.format(topic=topic, level=level)
+
+
+def get_model():
+    return settings.MISTRAL_AI_MODEL if settings.USE_OPENAI else settings.OPENAI_MODEL
+
+
+def is_mistral(client) -> bool:
+    # Checked by module so the SDK isn't imported just to compare types
+    return type(client).__module__.startswith("mistralai")
+
+
+class LLMClientManager:
+    """
+    Process-wide async provider client.
+
+    One httpx.AsyncClient (and so one keep-alive connection pool) is shared by
+    every request, and a semaphore bounds how many completions run at once.
+    Started and closed from the app lifespan in app/main.py.
+    """
+
+    def __init__(self):
+        self.http_client = None
+        self.client = None
+        self.semaphore = None
+
+    def startup(self):
+        if self.http_client is not None:
+            return
+
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+
+    async def shutdown(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        self.http_client = None
+        self.client = None
+        self.semaphore = None
+
+    def get_client(self):
+        """
+        Returns the provider client bound to the shared connection pool.
+
+        Built on first use rather than at startup, so a missing API key fails
+        the request instead of the whole app.
+        """
+        self.startup()
+        if self.client is None:
+            # Provider SDKs are heavy to import; only load the one in use
+            if settings.USE_OPENAI:
+                from mistralai import Mistral
+
+                self.client = Mistral(
+                    api_key=settings.MISTRAL_API_KEY,
+                    async_client=self.http_client,
+                    timeout_ms=int(settings.LLM_TIMEOUT * 1000),
+                )
+            else:
+                from openai import AsyncOpenAI
+
+                self.client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    http_client=self.http_client,
+                    timeout=settings.LLM_TIMEOUT,
+                )
+        return self.client
+
+    async def complete(self, messages: list[dict]) -> str:
+        """Returns the full completion for the given chat messages."""
+        client = self.get_client()
+        async with self.semaphore:
+            if is_mistral(client):
+                response = await client.chat.complete_async(
+                    model=get_model(), messages=messages
+                )
+            else:
+                response = await client.chat.completions.create(
+                    model=get_model(), messages=messages
+                )
+        return response.choices[0].message.content
+
+    async def stream(self, messages: list[dict]):
+        """
+        Yields completion text chunks as the provider streams them back.
+
+        The provider's response is closed however the generator ends, including
+        an early aclose(), so its connection goes back to the shared pool.
+        """
+        client = self.get_client()
+        async with self.semaphore:
+            if is_mistral(client):
+                response = await client.chat.stream_async(
+                    model=get_model(), messages=messages
+                )
+                async with response:
+                    async for event in response:
+                        chunk = event.data.choices[0].delta.content
+                        if chunk:
+                            yield chunk
+            else:
+                response = await client.chat.completions.create(
+                    model=get_model(), messages=messages, stream=True
+                )
+                async with response:
+                    async for event in response:
+                        if event.choices and event.choices[0].delta.content:
+                            yield event.choices[0].delta.content
+
+
+llm_clients = LLMClientManager()
+roadmap_completions = SingleFlight("roadmap_completion")
+
+
+async def generate_roadmap_content(
+    topic: str, level: str, bypass_cache: bool = False
+) -> tuple[str, bool]:
+    """
+    Returns the roadmap markdown for a topic and level, and whether it came from cache.
+
+    With bypass_cache the LLM is always called and the cached entry is refreshed.
+    """
+    model = get_model()
+    key = make_cache_key(topic, level, model, ROADMAP_PROMPT_VERSION)
+
+    if not bypass_cache:
+        content = await get_cached_roadmap(key)
+        if content is not None:
+            return content, True
+
+    # Identical concurrent requests share one completion
+    content = await roadmap_completions.do(
+        key, complete_and_cache_roadmap, key, topic, level, model
+    )
+    return content, False
+
+
+async def complete_and_cache_roadmap(key: str, topic: str, level: str, model: str):
+    content = await llm_clients.complete(
+        [{"role": "user", "content": build_roadmap_prompt(topic, level)}]
+    )
+    # Own session: this may outlive the request that started it
+    async with AsyncSessionLocal() as db:
+        await set_cached_roadmap(key, content, model, db)
+    return content
+
+
+def stream_roadmap_content(topic: str, level: str):
+    """Yields roadmap markdown chunks as the provider streams them back."""
+    return llm_clients.stream(
+        [{"role": "user", "content": build_roadmap_prompt(topic, level)}]
+    )
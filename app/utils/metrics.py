@@ -0,0 +1,4 @@
+from collections import Counter
+
+# Process-wide counters, e.g. metrics["roadmap_cache_hit"] += 1
+metrics = Counter()
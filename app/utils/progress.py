@@ -0,0 +1,78 @@
+"""
+Per-topic progress as a bitset: bit i (byte i // 8, least significant bit
+first, as Postgres' get_bit/set_bit count them) is set when the i-th topic of
+the roadmap's structure, in document order, is done. No bitset means nothing
+is done yet.
+"""
+
+from app.utils.roadmap_parser import CHECKBOX, LIST_MARKER, iter_topics
+
+
+def topic_positions(structure: dict) -> dict[str, int]:
+    return {topic["id"]: i for i, topic in enumerate(iter_topics(structure))}
+
+
+def set_bits(bitset: bytes | None, changes: dict[int, bool], size: int) -> bytes:
+    """A copy of bitset (sized for size topics) with changes {position: done}."""
+    bits = bytearray(bitset or b"")
+    bits.extend(bytes((size + 7) // 8 - len(bits)))
+    for position, done in changes.items():
+        if done:
+            bits[position // 8] |= 1 << position % 8
+        else:
+            bits[position // 8] &= ~(1 << position % 8)
+    return bytes(bits)
+
+
+def is_done(bitset: bytes | None, position: int) -> bool:
+    if not bitset or position // 8 >= len(bitset):
+        return False
+    return bool(bitset[position // 8] >> position % 8 & 1)
+
+
+def count_done(bitset: bytes | None) -> int:
+    return int.from_bytes(bitset, "little").bit_count() if bitset else 0
+
+
+def done_topic_ids(structure: dict, bitset: bytes | None) -> set[str]:
+    return {
+        topic["id"]
+        for i, topic in enumerate(iter_topics(structure))
+        if is_done(bitset, i)
+    }
+
+
+def with_progress(structure: dict, bitset: bytes | None) -> dict:
+    """A copy of structure with "done" set on every topic."""
+    modules = []
+    position = 0
+    for module in structure["modules"]:
+        topics = []
+        for topic in module["topics"]:
+            topics.append({**topic, "done": is_done(bitset, position)})
+            position += 1
+        modules.append({**module, "topics": topics})
+    return {**structure, "modules": modules}
+
+
+def tick(line: str, done: bool) -> str:
+    """A topic line with its checkbox set to done, added if it has none."""
+    start = LIST_MARKER.match(line).end()
+    text = line[start:]
+    if CHECKBOX.match(text):
+        text = text[3:]
+    else:
+        text = " " + text
+    return line[:start] + ("[x]" if done else "[ ]") + text
+
+
+def render_checklist(content: str, structure: dict, bitset: bytes | None) -> str:
+    """
+    The roadmap markdown with every topic as a checkbox, ticked ([x]) when
+    done. Topics written as plain list items get one after the list marker.
+    """
+    lines = content.split("\n")
+    for i, topic in enumerate(iter_topics(structure)):
+        number = topic["line"] - 1
+        lines[number] = tick(lines[number], is_done(bitset, i))
+    return "\n".join(lines)
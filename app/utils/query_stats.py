@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.database import sync_engines
+
+current_query_stats = ContextVar("current_query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts and times the SQL statements issued inside the block, e.g.
+
+        with count_queries() as stats:
+            await RoadmapRepository(db).get_for_user(roadmap_id, user_id)
+        assert stats.count == 1
+
+    Every request runs inside one (see app/main.py), and reports it in the
+    X-Query-Count and X-Query-Time headers for endpoint-level assertions.
+    """
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_started_at", None)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        if started_at is not None:
+            stats.duration += time.perf_counter() - started_at
+
+
+# The async engines run their cursors on sync engines under the hood
+for _engine in sync_engines:
+    event.listen(_engine, "before_cursor_execute", start_query_timer)
+    event.listen(_engine, "after_cursor_execute", record_query)
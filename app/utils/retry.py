@@ -0,0 +1,11 @@
+import random
+
+
+def backoff_delay(base: float, attempt: int) -> float:
+    """
+    Exponential backoff with jitter for the attempt-th retry (1-based): somewhere
+    between half and all of base * 2 ** (attempt - 1), so clients that failed
+    together don't all retry together.
+    """
+    delay = base * 2 ** (attempt - 1)
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,115 @@
+"""
+Roadmap markdown -> structure, parsed once when a roadmap is stored:
+
+    {
+        "version": 1,
+        "title": "Python Roadmap",
+        "topic_count": 2,
+        "modules": [
+            {
+                "id": "1",
+                "title": "Module 1: Basics",
+                "line": 3,
+                "topics": [
+                    {"id": "1.1", "title": "Variables", "line": 4},
+                    {"id": "1.2", "title": "Types", "line": 5},
+                ],
+            }
+        ],
+    }
+
+Ids are positional (module number, topic number within it), so they stay put
+for as long as the content does, which is forever once stored. Lines are
+1-based line numbers in the markdown. Topics before the first module go in a
+module with no title.
+"""
+
+import re
+
+STRUCTURE_VERSION = 1
+
+HEADING = re.compile(r"(#{1,6})\s+(.*)")
+LIST_ITEM = re.compile(r"(?:[-*+]|\d+[.)])\s+(.*)")
+LIST_MARKER = re.compile(r"\s*(?:(?:[-*+]|\d+[.)])\s+)?")  # Indent included
+CHECKBOX = re.compile(r"\[([ xX])\]\s*(.*)")
+BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+TITLE = "title"
+MODULE = "module"
+TOPIC = "topic"
+
+
+def strip_markdown(text: str) -> str:
+    return BOLD.sub(r"\1", text).strip()
+
+
+def parse_line(line: str) -> tuple[str, str] | None:
+    """
+    (kind, text) for a roadmap line: a # heading is a TITLE, deeper headings
+    and lines that are entirely **bold** are MODULEs, checklist and list items
+    are TOPICs. None for anything else.
+    """
+    text = line.strip()
+    if not text:
+        return None
+
+    listed = LIST_ITEM.fullmatch(text)
+    if listed:
+        text = listed[1]
+
+    heading = HEADING.fullmatch(text)
+    if heading:
+        return (TITLE if len(heading[1]) == 1 else MODULE), strip_markdown(heading[2])
+    checkbox = CHECKBOX.fullmatch(text)
+    if checkbox:
+        return TOPIC, strip_markdown(checkbox[2])
+    if BOLD.fullmatch(text):
+        return MODULE, strip_markdown(text)
+    if listed:
+        return TOPIC, strip_markdown(text)
+    return None
+
+
+def parse_roadmap(content: str) -> dict:
+    """The roadmap's structure (see the module docstring), in one pass."""
+    title = None
+    modules = []
+    module = None
+    topic_count = 0
+
+    for number, line in enumerate(content.split("\n"), 1):
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        kind, text = parsed
+
+        # "**Course Title**" on the first line is the course title
+        if title is None and (
+            kind == TITLE
+            or (kind == MODULE and not modules and line.lstrip().startswith("**"))
+        ):
+            title = text
+        elif kind in (TITLE, MODULE):
+            module = {"id": str(len(modules) + 1), "title": text, "line": number}
+            module["topics"] = []
+            modules.append(module)
+        else:
+            if module is None:
+                module = {"id": "1", "title": None, "line": None, "topics": []}
+                modules.append(module)
+            topic_id = f"{module['id']}.{len(module['topics']) + 1}"
+            module["topics"].append({"id": topic_id, "title": text, "line": number})
+            topic_count += 1
+
+    return {
+        "version": STRUCTURE_VERSION,
+        "title": title,
+        "topic_count": topic_count,
+        "modules": modules,
+    }
+
+
+def iter_topics(structure: dict):
+    """Every topic, in document order."""
+    for module in structure["modules"]:
+        yield from module["topics"]
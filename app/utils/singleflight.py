@@ -0,0 +1,35 @@
+import asyncio
+from app.utils.metrics import metrics
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight call.
+
+    The first caller starts the call as its own task and every concurrent
+    duplicate awaits that same task, so a caller that disconnects doesn't
+    cancel the result for the others. Counters are reported as
+    metrics["<name>_calls"] and metrics["<name>_coalesced"]. Coalescing is per
+    process; the generation cache covers repeats across workers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = {}
+
+    async def do(self, key: str, fn, *args, **kwargs):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn(*args, **kwargs))
+            self.calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            metrics[f"{self.name}_calls"] += 1
+        else:
+            metrics[f"{self.name}_coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every caller went away
@@ -1,57 +1,128 @@
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from jose import JWTError
+from cachetools import TTLCache
+from app.database import AsyncSessionLocal, get_db
 from app.settings import settings
-from app.models import User, Roadmap
-from app.utils.jwt import verify_password
+from app.models import User
+from app.utils.jwt import decode_access_token, password_hasher
+from app.utils.metrics import metrics
 from fastapi.security import OAuth2PasswordBearer
 from functools import wraps
+from dataclasses import dataclass
+from uuid import UUID
+import inspect
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def get_roadmaps_by_user_id(user_id: int, db: Session = Depends(get_db)):
-    """Fetch all roadmaps for a given user ID."""
-    return db.query(Roadmap).filter(Roadmap.user_id == user_id).all()
-
-
-def get_user(email: str, db: Session = Depends(get_db)):
+async def get_user(email: str, db: AsyncSession = Depends(get_db)):
     """Fetch a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    result = await db.scalars(select(User).where(User.email == email))
+    return result.first()
 
 
-def authenticate_user(email: str, password: str, db: Session = Depends(get_db)):
-    """Verify user credentials."""
-    user = get_user(email, db)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(
+    email: str, password: str, db: AsyncSession = Depends(get_db)
+):
+    """Verify user credentials, upgrading the stored hash if its cost is stale."""
+    user = await get_user(email, db)
+    if not user or not user.hashed_password:
         return None  # Return None instead of False for better handling
+
+    valid, new_hash = await password_hasher.verify_and_update(
+        password, user.hashed_password
+    )
+    if not valid:
+        return None
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-):
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """
+    Immutable snapshot of the authenticated user, detached from any session so
+    it can be cached and shared between requests. Supports user.id and
+    user["id"] alike.
+    """
+
+    id: int
+    uuid: UUID | None
+    email: str
+    first_name: str | None
+    last_name: str | None
+    avatar_url: str | None
+    google_oauth_token: str | None
+    github_token: str | None
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            uuid=user.uuid,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            avatar_url=user.avatar_url,
+            google_oauth_token=user.google_oauth_token,
+            github_token=user.github_token,
+        )
+
+
+# Per-process principal cache keyed by email. The TTL bounds how stale another
+# worker's copy can get; this process drops entries itself via invalidate_user.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL)
+
+
+def invalidate_user(email: str):
+    """Call after changing anything about a user that CurrentUser carries."""
+    user_cache.pop(email, None)
+
+
+async def get_current_user(token: str, db: AsyncSession | None = None) -> CurrentUser:
     """Extract and verify user from JWT token."""
     credentials_exception = HTTPException(
         status_code=401,
         detail="Invalid credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    user = None
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_email: str = payload.get("email")
-        if not user_email:
-            raise credentials_exception
-        user = db.Query(User).filter(User.email == user_email).first()
-        if not user:
-            raise HTTPException(status=404, detail="User not found")
+        payload = decode_access_token(token)
     except JWTError:
         raise credentials_exception
+
+    user_email: str = payload.get("email")
+    if not user_email:
+        raise credentials_exception
+
+    user = user_cache.get(user_email)
+    if user is not None:
+        metrics["user_cache_hit"] += 1
+        return user
+
+    metrics["user_cache_miss"] += 1
+    if db is None:
+        async with AsyncSessionLocal() as session:
+            db_user = await get_user(user_email, session)
+    else:
+        db_user = await get_user(user_email, db)
+        # Ends the read, so the route doesn't hold a pooled connection through
+        # whatever slow work (an LLM call, a long poll) comes before its next query
+        await db.commit()
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user = CurrentUser.from_user(db_user)
+    user_cache[user_email] = user
     return user
 
 
@@ -60,15 +131,12 @@ def require_auth(func):
     """Decorator to enforce authentication."""
 
     @wraps(func)
-    async def wrapper(
-        *args,
-        request: Request,
-        db: Session = Depends(get_db),
-        token: str = Depends(oauth2_scheme),
-        **kwargs
-    ):
-        user = get_current_user(token, db)
+    async def wrapper(*args, request: Request, **kwargs):
+        token = await oauth2_scheme(request)
+        user = await get_current_user(token, kwargs.get("db"))
         request.state.user = user  # Attach user to request
-        return await func(*args, request=request, **kwargs)
+        if inspect.iscoroutinefunction(func):
+            return await func(*args, request=request, **kwargs)
+        return await run_in_threadpool(func, *args, request=request, **kwargs)
 
     return wrapper
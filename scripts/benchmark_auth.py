@@ -0,0 +1,77 @@
+"""
+Per-request auth overhead of get_current_user, cold vs warm caches.
+
+Run from the repo root after migrating:
+
+    python -m scripts.benchmark_auth [--iterations 2000]
+
+"cold" clears the JWT and user caches before every call, which is what each
+request paid before they existed: HS256 verification plus a users query.
+"""
+
+import argparse
+import asyncio
+import time
+from app.database import SessionLocal, dispose_engines
+from app.models import User
+from app.utils.jwt import create_access_token, verified_tokens
+from app.utils.metrics import metrics
+from app.utils.query_stats import count_queries
+from app.utils.user import get_current_user, user_cache
+
+BENCHMARK_EMAIL = "auth-benchmark@example.com"
+
+
+def ensure_user():
+    with SessionLocal() as db:
+        if not db.query(User.id).filter(User.email == BENCHMARK_EMAIL).first():
+            db.add(User(email=BENCHMARK_EMAIL, first_name="Benchmark"))
+            db.commit()
+
+
+async def measure(token: str, iterations: int, cold: bool) -> tuple[float, float]:
+    """Returns (microseconds per call, queries per call)."""
+    queries = 0
+    elapsed = 0.0
+    for _ in range(iterations):
+        if cold:
+            verified_tokens.clear()
+            user_cache.clear()
+        with count_queries() as stats:
+            started = time.perf_counter()
+            await get_current_user(token)
+            elapsed += time.perf_counter() - started
+        queries += stats.count
+    return elapsed / iterations * 1e6, queries / iterations
+
+
+async def compare(token: str, iterations: int):
+    cold = await measure(token, iterations, cold=True)
+    metrics.clear()
+    warm = await measure(token, iterations, cold=False)
+    await dispose_engines()
+    return cold, warm
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_auth")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    ensure_user()
+    token = create_access_token({"email": BENCHMARK_EMAIL, "scope": "access_token"})
+
+    cold, warm = asyncio.run(compare(token, args.iterations))
+    cold_us, cold_queries = cold
+    warm_us, warm_queries = warm
+
+    print(f"cold: {cold_us:8.1f} us/request, {cold_queries:.2f} queries/request")
+    print(f"warm: {warm_us:8.1f} us/request, {warm_queries:.2f} queries/request")
+    print(f"speedup: {cold_us / warm_us:.1f}x")
+    for name in ("jwt_cache", "user_cache"):
+        hits, misses = metrics[f"{name}_hit"], metrics[f"{name}_miss"]
+        print(f"{name} hit ratio: {hits / max(hits + misses, 1):.2%}")
+
+
+if __name__ == "__main__":
+    main()
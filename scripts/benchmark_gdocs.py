@@ -0,0 +1,84 @@
+"""
+Parses a generated roadmap and compiles it into Google Docs batchUpdate
+requests.
+
+    python -m scripts.benchmark_gdocs [--lines 10000] [--iterations 20]
+
+The roadmap mixes headings, checklist items, bold text and non-ASCII /
+astral-plane characters; every third topic is marked done. Parsing happens once
+when a roadmap is stored, compiling on every export, so they are timed apart.
+Besides timings it reports how many requests and batches come out, against the
+two requests per line the old formatter sent in one body, and checks that every
+range lies inside the inserted text (exit status 1 if not).
+"""
+
+import argparse
+import json
+import statistics
+import time
+from app.utils.gdocs import batch_requests, compile_roadmap, utf16_len
+from app.utils.roadmap_parser import iter_topics, parse_roadmap
+
+
+def make_roadmap(lines: int) -> str:
+    out = ["# Benchmark Roadmap 🚀", ""]
+    module = 0
+    while len(out) < lines:
+        module += 1
+        out.append(f"- ## Module {module}: Naïve **Basics** — Überblick")
+        for topic in range(9):
+            out.append(f"    - [ ] Topic {topic}: **Client-Server** 😀 café")
+    return "\n".join(out[:lines])
+
+
+def check_ranges(doc_requests: list[dict]) -> int:
+    """Number of ranges that fall outside the inserted text."""
+    text = "".join(r["insertText"]["text"] for r in doc_requests if "insertText" in r)
+    end = 1 + utf16_len(text)
+    bad = 0
+    for request in doc_requests:
+        (body,) = request.values()
+        if "range" in body:
+            r = body["range"]
+            bad += not (1 <= r["startIndex"] < r["endIndex"] <= end)
+    return bad
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_gdocs")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    content = make_roadmap(args.lines)
+    parse_timings = []
+    timings = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        structure = parse_roadmap(content)
+        parse_timings.append(time.perf_counter() - started)
+
+        done = {t["id"] for i, t in enumerate(iter_topics(structure)) if i % 3 == 0}
+        started = time.perf_counter()
+        doc_requests = compile_roadmap(structure, done)
+        batches = batch_requests(doc_requests)
+        timings.append(time.perf_counter() - started)
+
+    size = sum(len(json.dumps({"requests": b})) for b in batches)
+    bad = check_ranges(doc_requests)
+    print(
+        f"{args.lines} lines, {len(content.encode()) / 1024:.0f} KiB: "
+        f"parse median {statistics.median(parse_timings) * 1000:.1f}ms, "
+        f"compile + batch median {statistics.median(timings) * 1000:.1f}ms, "
+        f"min {min(timings) * 1000:.1f}ms"
+    )
+    print(
+        f"{len(doc_requests)} requests in {len(batches)} batches "
+        f"({size / 1024:.0f} KiB), vs {2 * args.lines} requests in one body before"
+    )
+    print(f"ranges outside the text: {bad}")
+    raise SystemExit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
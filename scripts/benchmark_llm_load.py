@@ -0,0 +1,151 @@
+"""
+Database pool pressure from slow requests: concurrent roadmap generations
+against a fake LLM provider that takes --llm-seconds to answer, and long-polls
+of an unfinished job, while a roadmap listing is timed alongside.
+
+Run from the repo root after migrating:
+
+    python -m scripts.benchmark_llm_load [--generations 6] [--pollers 6]
+        [--llm-seconds 5] [--budget-ms 1000]
+
+Requests go through the app in-process, without its lifespan, so no job
+worker runs and the polled job stays queued. Each generation is a cache miss.
+The listing only stays fast if none of them holds a pooled connection (the
+SQLite reader pool has SQLITE_READERS and no overflow) while it waits. Exit
+status 1 if a request fails or a listing takes longer than --budget-ms.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+import httpx
+from openai import AsyncOpenAI
+from app.database import SessionLocal, dispose_engines
+from app.main import app
+from app.models import User
+from app.settings import settings
+from app.utils.jwt import create_access_token
+from app.utils.llm import llm_clients
+
+BENCHMARK_EMAIL = "llm-load-benchmark@example.com"
+CONTENT = "# Benchmark Roadmap\n\n- ## Module 1: Basics\n    - [ ] Topic\n"
+
+
+def ensure_user() -> int:
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == BENCHMARK_EMAIL).first()
+        if not user:
+            user = User(email=BENCHMARK_EMAIL, first_name="Benchmark")
+            db.add(user)
+            db.commit()
+        return user.id
+
+
+def fake_provider(seconds: float):
+    """An OpenAI client whose completions take seconds and return CONTENT."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(seconds)
+        message = {"role": "assistant", "content": CONTENT}
+        choice = {"index": 0, "message": message, "finish_reason": "stop"}
+        body = {"id": "c", "object": "chat.completion", "created": 0}
+        body.update(model="benchmark", choices=[choice])
+        return httpx.Response(200, content=json.dumps(body))
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return http_client, AsyncOpenAI(api_key="benchmark", http_client=http_client)
+
+
+async def run(args, user_id: int, token: str) -> bool:
+    llm_clients.startup()
+    await llm_clients.http_client.aclose()
+    llm_clients.http_client, llm_clients.client = fake_provider(args.llm_seconds)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    # Errors (such as a pool timeout) come back as 500s, like they would served
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        latencies, failures = await load(args, user_id, transport, headers)
+    finally:
+        await llm_clients.shutdown()
+        await dispose_engines()
+
+    print(
+        f"{args.generations} generations, {args.pollers} job long-polls, "
+        f"LLM {args.llm_seconds}s, {settings.SQLITE_READERS} SQLite readers"
+    )
+    print(
+        f"listing: {len(latencies)} requests, "
+        f"p50 {statistics.median(latencies):8.2f}ms, max {max(latencies):8.2f}ms "
+        f"(budget {args.budget_ms}ms)"
+    )
+    for failure in failures:
+        print(f"FAILED {failure[:200]}")
+    return not failures and max(latencies) <= args.budget_ms
+
+
+async def load(args, user_id: int, transport, headers: dict):
+    """Returns (listing latencies in ms, failed requests)."""
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", headers=headers, timeout=60
+    ) as client:
+        prefix = settings.PREFIX
+        queued = await client.post(
+            f"{prefix}/roadmaps/generate?background=true",
+            json={"topic": f"Queued {uuid.uuid4()}", "level": "beginner"},
+        )
+        job_id = queued.json()["job"]
+
+        started = time.perf_counter()
+        slow = [
+            client.post(
+                f"{prefix}/roadmaps/generate",
+                json={"topic": f"Load {uuid.uuid4()}", "level": "beginner"},
+            )
+            for _ in range(args.generations)
+        ] + [
+            client.get(
+                f"{prefix}/roadmaps/jobs/{job_id}", params={"wait": args.llm_seconds}
+            )
+            for _ in range(args.pollers)
+        ]
+        slow_tasks = [asyncio.ensure_future(request) for request in slow]
+
+        # Listings while the slow requests are all waiting
+        await asyncio.sleep(min(1.0, args.llm_seconds / 4))
+        latencies = []
+        failures = []
+        while time.perf_counter() - started < args.llm_seconds * 0.8:
+            listed = time.perf_counter()
+            response = await client.get(f"{prefix}/users/{user_id}/roadmaps")
+            latencies.append((time.perf_counter() - listed) * 1000)
+            if response.status_code != 200:
+                failures.append(f"listing: {response.status_code} {response.text}")
+            await asyncio.sleep(0.1)
+
+        for response in await asyncio.gather(*slow_tasks):
+            if response.status_code != 200:
+                path = response.request.url.path
+                failures.append(f"{path}: {response.status_code} {response.text}")
+    return latencies, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_llm_load")
+    parser.add_argument("--generations", type=int, default=6)
+    parser.add_argument("--pollers", type=int, default=6)
+    parser.add_argument("--llm-seconds", type=float, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args(argv)
+
+    user_id = ensure_user()
+    token = create_access_token({"email": BENCHMARK_EMAIL, "scope": "access_token"})
+    if not asyncio.run(run(args, user_id, token)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
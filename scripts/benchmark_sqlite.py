@@ -0,0 +1,169 @@
+"""
+Mixed read/write load against a scratch SQLite database, with the plain async
+engine (rollback journal, shared pool) and with the SQLite profile from
+app.database (WAL, pragmas, single writer + reader pool).
+
+    python -m scripts.benchmark_sqlite [--seconds 10] [--processes 4]
+        [--writers 8] [--readers 16]
+
+--writers and --readers are per process. Writers insert roadmaps and delete
+every other one, like generate and delete calls (each commit counts as a
+write). Readers list a page of roadmaps and open one, like the profile and
+roadmap pages.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.database import (
+    RoutingSession,
+    async_database_url,
+    create_sqlite_engines,
+)
+from app.migrations import upgrade
+from app.models import User
+from app.repositories import RoadmapRepository
+
+CONTENT = "# Benchmark Roadmap\n\n- ## Module 1: Basics\n    - [ ] Topic\n" * 20
+
+
+def plain_sessions(url: str):
+    engine = create_async_engine(async_database_url(url))
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    return sessions, [engine]
+
+
+def tuned_sessions(url: str):
+    reader, writer = create_sqlite_engines(url)
+    sessions = async_sessionmaker(
+        sync_session_class=RoutingSession,
+        reader=reader.sync_engine,
+        writer=writer.sync_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    return sessions, [reader, writer]
+
+
+def create_database(path: str) -> tuple[str, int]:
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    upgrade(engine)  # The full schema, search index included
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            User.__table__.insert().values(email="bench@example.com")
+        ).inserted_primary_key[0]
+    engine.dispose()
+    return url, user_id
+
+
+async def run_load(sessions, user_id: int, seconds: float, writers: int, readers: int):
+    deadline = time.monotonic() + seconds
+    stats = {"writes": 0, "locked": 0, "read_latencies": []}
+
+    async def writer():
+        n = 0
+        while time.monotonic() < deadline:
+            try:
+                async with sessions() as db:
+                    repository = RoadmapRepository(db)
+                    roadmap = await repository.create(user_id, "Benchmark", CONTENT)
+                    await db.commit()
+                    stats["writes"] += 1
+                    n += 1
+                    if n % 2 == 0:
+                        await repository.delete_for_user(roadmap.id, user_id)
+                        await db.commit()
+                        stats["writes"] += 1
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                stats["locked"] += 1
+
+    async def reader():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            async with sessions() as db:
+                repository = RoadmapRepository(db)
+                rows, _ = await repository.list_for_user(user_id, limit=20)
+                if rows:
+                    await repository.get_for_user(
+                        rows[0].id, user_id, include_content=True
+                    )
+            stats["read_latencies"].append(time.perf_counter() - started)
+
+    await asyncio.gather(
+        *[writer() for _ in range(writers)], *[reader() for _ in range(readers)]
+    )
+    return stats
+
+
+def report(name: str, stats: dict, seconds: float):
+    latencies = sorted(stats["read_latencies"]) or [0.0]
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else 0.0
+    print(
+        f"{name:>6}: {stats['writes'] / seconds:8.1f} writes/s, "
+        f"{stats['locked']:5d} 'database is locked', "
+        f"{len(latencies) / seconds:8.1f} reads/s, "
+        f"read p50 {statistics.median(latencies) * 1000:7.2f}ms "
+        f"p95 {p95 * 1000:7.2f}ms"
+    )
+
+
+SESSION_FACTORIES = {"plain": plain_sessions, "tuned": tuned_sessions}
+
+
+async def load_process(mode: str, url: str, user_id: int, args) -> dict:
+    sessions, engines = SESSION_FACTORIES[mode](url)
+    try:
+        return await run_load(
+            sessions, user_id, args.seconds, args.writers, args.readers
+        )
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+
+def run_process(mode: str, url: str, user_id: int, args) -> dict:
+    return asyncio.run(load_process(mode, url, user_id, args))
+
+
+def benchmark(args):
+    for mode in SESSION_FACTORIES:
+        with tempfile.TemporaryDirectory() as directory:
+            url, user_id = create_database(os.path.join(directory, "bench.sqlite"))
+            # One process per app worker; writes from different processes are
+            # where "database is locked" comes from
+            with ProcessPoolExecutor(args.processes) as pool:
+                futures = [
+                    pool.submit(run_process, mode, url, user_id, args)
+                    for _ in range(args.processes)
+                ]
+                results = [future.result() for future in futures]
+
+        stats = {
+            "writes": sum(r["writes"] for r in results),
+            "locked": sum(r["locked"] for r in results),
+            "read_latencies": [t for r in results for t in r["read_latencies"]],
+        }
+        report(mode, stats, args.seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_sqlite")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=1)
+    benchmark(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Cold start of app.main: import time and time to first request, with budgets.
+
+    python -m scripts.benchmark_startup [--runs 5] [--import-budget-ms 2500]
+        [--first-request-budget-ms 4000]
+
+Import time comes from `python -X importtime -c "import app.main"` in a fresh
+interpreter (median of --runs). Time to first request starts uvicorn on a free
+port and polls the metrics endpoint until it answers. Exits with status 1 if
+either median is over budget, or if a lazily loaded dependency (provider SDKs,
+authlib) gets imported at startup again.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+# Only needed on the code paths that use them; importing them at startup
+# costs every worker, including the ones that just serve reads
+LAZY_MODULES = ("mistralai", "openai", "authlib")
+
+CHECK_LAZY_MODULES = (
+    "import sys, app.main; "
+    f"print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+)
+
+
+def environment() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "startup-benchmark")
+    return env
+
+
+def import_time() -> tuple[float, list[tuple[float, str]]]:
+    """Returns (ms to import app.main, [(self ms, module)] heaviest first)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        if not own.strip().isdigit():
+            continue  # header
+        modules.append((int(own) / 1000, name.strip()))
+        if name.strip() == "app.main":
+            total = int(cumulative) / 1000
+    return total, sorted(modules, reverse=True)
+
+
+def eagerly_imported() -> list[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_LAZY_MODULES],
+        env=environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_request_time(timeout: float = 60) -> float:
+    """ms from spawning uvicorn to the first successful response."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/v1/metrics"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=environment(),
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"No response from {url} after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scripts.benchmark_startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=2500)
+    parser.add_argument("--first-request-budget-ms", type=float, default=4000)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    imports = [import_time() for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in imports)
+    first_request_ms = statistics.median(first_request_time() for _ in range(args.runs))
+    eager = eagerly_imported()
+
+    print("heaviest modules (self time, last run):")
+    for own, name in imports[-1][1][: args.top]:
+        print(f"  {own:8.1f}ms  {name}")
+    print(f"import app.main: {import_ms:8.1f}ms (budget {args.import_budget_ms}ms)")
+    print(
+        f"first request:   {first_request_ms:8.1f}ms "
+        f"(budget {args.first_request_budget_ms}ms)"
+    )
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append("import time is over budget")
+    if first_request_ms > args.first_request_budget_ms:
+        failures.append("time to first request is over budget")
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
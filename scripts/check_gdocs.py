@@ -0,0 +1,129 @@
+"""
+Golden-output check of the Google Docs batchUpdate requests compiled from a
+small roadmap: the inserted text, and the UTF-16 ranges of the title and
+module headings, the checklist bullets and the struck-through done topics.
+
+    python -m scripts.check_gdocs
+
+The roadmap has astral-plane characters (🦀, 😀 are two UTF-16 code units
+each), so an offset counted in Python characters shows up as a mismatch.
+Exit status 1 if any output differs from the expected one.
+"""
+
+import json
+import sys
+from app.settings import settings
+from app.utils.gdocs import batch_requests, compile_roadmap
+from app.utils.roadmap_parser import parse_roadmap
+
+ROADMAP = """# Rust 🦀 Roadmap
+
+- ## Module 1: Basics
+    - [ ] Ownership 😀
+    - [ ] Borrowing
+    - [ ] Lifetimes
+- ## Module 2: Async
+    - [ ] Futures
+"""
+DONE = {"1.1", "1.2", "2.1"}
+
+TEXT = (
+    "Rust 🦀 Roadmap\n"  # 1-17: 15 code units and the newline
+    "Module 1: Basics\n"  # 17-34
+    "Ownership 😀\n"  # 34-47
+    "Borrowing\n"  # 47-57
+    "Lifetimes\n"  # 57-67
+    "Module 2: Async\n"  # 67-83
+    "Futures\n"  # 83-91
+)
+
+
+def paragraph_style(style: str, start: int, end: int) -> dict:
+    return {
+        "updateParagraphStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "paragraphStyle": {"namedStyleType": style},
+            "fields": "namedStyleType",
+        }
+    }
+
+
+def bullets(start: int, end: int) -> dict:
+    return {
+        "createParagraphBullets": {
+            "range": {"startIndex": start, "endIndex": end},
+            "bulletPreset": "BULLET_CHECKBOX",
+        }
+    }
+
+
+def strikethrough(start: int, end: int) -> dict:
+    return {
+        "updateTextStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "textStyle": {"strikethrough": True},
+            "fields": "strikethrough",
+        }
+    }
+
+
+STYLES = [
+    paragraph_style("TITLE", 1, 17),
+    paragraph_style("HEADING_2", 17, 34),
+    paragraph_style("HEADING_2", 67, 83),
+    # Both modules' topics, each run including its last newline
+    bullets(34, 67),
+    bullets(83, 91),
+    # Ownership and Borrowing are done and one newline apart: one request
+    strikethrough(34, 56),
+    strikethrough(83, 90),
+]
+EXPECTED = [{"insertText": {"endOfSegmentLocation": {}, "text": TEXT}}] + STYLES
+
+
+def compare(name: str, actual, expected) -> bool:
+    if actual == expected:
+        print(f"ok      {name}")
+        return True
+    print(f"MISMATCH {name}")
+    print("expected:", json.dumps(expected, ensure_ascii=False, indent=1))
+    print("actual:  ", json.dumps(actual, ensure_ascii=False, indent=1))
+    return False
+
+
+def main() -> int:
+    structure = parse_roadmap(ROADMAP)
+    doc_requests = compile_roadmap(structure, DONE)
+    ok = compare("compile_roadmap", doc_requests, EXPECTED)
+
+    ok &= compare(
+        "batch_requests",
+        batch_requests(doc_requests, max_requests=3),
+        [EXPECTED[:3], EXPECTED[3:6], EXPECTED[6:]],
+    )
+
+    # Inserts split on paragraph boundaries, at 40 bytes of JSON (an emoji is
+    # 12 of them, as \u escapes); the style ranges don't move
+    max_bytes = settings.GOOGLE_DOCS_BATCH_MAX_BYTES
+    settings.GOOGLE_DOCS_BATCH_MAX_BYTES = 80
+    try:
+        split = compile_roadmap(structure, DONE)
+    finally:
+        settings.GOOGLE_DOCS_BATCH_MAX_BYTES = max_bytes
+    inserts = [
+        {"insertText": {"endOfSegmentLocation": {}, "text": text}}
+        for text in (
+            "Rust 🦀 Roadmap\n",
+            "Module 1: Basics\n",
+            "Ownership 😀\nBorrowing\n",
+            "Lifetimes\nModule 2: Async\n",
+            "Futures\n",
+        )
+    ]
+    ok &= compare("compile_roadmap, split inserts", split, inserts + STYLES)
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Golden-output check of render_checklist, which writes stored progress back
+into the roadmap markdown (GET /roadmaps/{id} and the GitHub export).
+
+    python -m scripts.check_progress
+
+Topics come as checkbox items, plain bullets and numbered items; each must come
+out as a checkbox in the right state, and parse back to the same structure.
+Exit status 1 if any output differs from the expected one.
+"""
+
+import sys
+from app.utils.progress import render_checklist, set_bits, topic_positions
+from app.utils.roadmap_parser import parse_roadmap
+
+ROADMAP = """# Go Roadmap
+
+- ## Module 1: Basics
+    - [ ] Syntax
+    - [X] Types
+    - Packages
+    * Modules [ ] and workspaces
+1. **Module 2: Concurrency**
+    1. Goroutines
+    2) [x] Channels
+    + [ ] Select"""
+
+NOTHING_DONE = """# Go Roadmap
+
+- ## Module 1: Basics
+    - [ ] Syntax
+    - [ ] Types
+    - [ ] Packages
+    * [ ] Modules [ ] and workspaces
+1. **Module 2: Concurrency**
+    1. [ ] Goroutines
+    2) [ ] Channels
+    + [ ] Select"""
+
+SOME_DONE = """# Go Roadmap
+
+- ## Module 1: Basics
+    - [x] Syntax
+    - [ ] Types
+    - [x] Packages
+    * [x] Modules [ ] and workspaces
+1. **Module 2: Concurrency**
+    1. [x] Goroutines
+    2) [ ] Channels
+    + [ ] Select"""
+
+
+def compare(name: str, actual: str, expected: str) -> bool:
+    if actual == expected:
+        print(f"ok       {name}")
+        return True
+    print(f"MISMATCH {name}")
+    print(f"expected:\n{expected}\nactual:\n{actual}")
+    return False
+
+
+def main() -> int:
+    structure = parse_roadmap(ROADMAP)
+    positions = topic_positions(structure)
+    done = {"1.1", "1.3", "1.4", "2.1"}
+    bitset = set_bits(None, {positions[i]: True for i in done}, len(positions))
+
+    ok = compare(
+        "no progress", render_checklist(ROADMAP, structure, None), NOTHING_DONE
+    )
+    rendered = render_checklist(ROADMAP, structure, bitset)
+    ok &= compare("some done", rendered, SOME_DONE)
+    ok &= compare(
+        "rendered again", render_checklist(rendered, structure, bitset), SOME_DONE
+    )
+    if parse_roadmap(rendered) != structure:
+        print("MISMATCH rendered roadmap parses to a different structure")
+        ok = False
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
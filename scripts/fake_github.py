@@ -0,0 +1,176 @@
+"""
+In-memory stand-in for the parts of the GitHub API the roadmap export uses, to
+try exports (and their retries) locally:
+
+    python -m scripts.fake_github [--port 8010] [--fail-every 5]
+        [--secondary-limit-every 7] [--rate-limit 100]
+    GITHUB_API_BASE_URL=http://127.0.0.1:8010 uvicorn app.main:app
+
+--fail-every answers every Nth request with a 502, --secondary-limit-every
+every Nth with a 403 and Retry-After: 1, and --rate-limit is the number of
+calls per token per minute (X-RateLimit-* headers, then 403s until reset).
+GET /_requests lists the requests received so far.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+options = argparse.Namespace(fail_every=0, secondary_limit_every=0, rate_limit=5000)
+state = {"count": 0, "requests": [], "repos": {}, "objects": {}, "budgets": {}}
+
+
+def object_sha(data) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def store(data) -> str:
+    sha = object_sha(data)
+    state["objects"][sha] = data
+    return sha
+
+
+def token_login(request: Request) -> str:
+    token = request.headers.get("Authorization", "").removeprefix("token ")
+    return "user-" + hashlib.sha256(token.encode()).hexdigest()[:8]
+
+
+def commit(repo: dict, message: str, files: dict, parents: list) -> str:
+    sha = store({"message": message, "tree": store(files), "parents": parents})
+    repo["heads"][repo["default_branch"]] = sha
+    return sha
+
+
+@app.middleware("http")
+async def inject_failures(request: Request, call_next):
+    if request.url.path == "/_requests":
+        return await call_next(request)
+    state["count"] += 1
+    state["requests"].append(f"{request.method} {request.url.path}")
+
+    login = token_login(request)
+    reset, remaining = state["budgets"].get(login, (0, 0))
+    if reset <= time.time():
+        reset, remaining = int(time.time()) + 60, options.rate_limit
+    remaining = max(remaining - 1, -1)
+    state["budgets"][login] = (reset, remaining)
+    headers = {
+        "X-RateLimit-Limit": str(options.rate_limit),
+        "X-RateLimit-Remaining": str(max(remaining, 0)),
+        "X-RateLimit-Reset": str(reset),
+    }
+
+    if remaining < 0:
+        content = {"message": "API rate limit exceeded"}
+        return JSONResponse(content, status_code=403, headers=headers)
+    if options.fail_every and state["count"] % options.fail_every == 0:
+        return JSONResponse({"message": "Server Error"}, status_code=502)
+    if (
+        options.secondary_limit_every
+        and state["count"] % options.secondary_limit_every == 0
+    ):
+        content = {"message": "You have exceeded a secondary rate limit"}
+        return JSONResponse(content, status_code=403, headers={"Retry-After": "1"})
+
+    response = await call_next(request)
+    response.headers.update(headers)
+    return response
+
+
+@app.get("/_requests")
+def list_requests():
+    return state["requests"]
+
+
+@app.get("/user")
+def get_user(request: Request):
+    return {"login": token_login(request)}
+
+
+@app.post("/user/repos")
+async def create_repo(request: Request):
+    body = await request.json()
+    key = (token_login(request), body["name"])
+    if key in state["repos"]:
+        return JSONResponse({"message": "name already exists"}, status_code=422)
+    repo = state["repos"][key] = {"default_branch": "main", "heads": {}}
+    if body.get("auto_init"):
+        commit(repo, "Initial commit", {"README.md": f"# {body['name']}\n"}, [])
+    return JSONResponse({"default_branch": "main"}, status_code=201)
+
+
+def find_repo(owner: str, name: str) -> dict | None:
+    return state["repos"].get((owner, name))
+
+
+@app.get("/repos/{owner}/{name}")
+def get_repo(owner: str, name: str):
+    repo = find_repo(owner, name)
+    if not repo:
+        return JSONResponse({"message": "Not Found"}, status_code=404)
+    return {"default_branch": repo["default_branch"]}
+
+
+@app.get("/repos/{owner}/{name}/git/ref/heads/{branch}")
+def get_ref(owner: str, name: str, branch: str):
+    repo = find_repo(owner, name)
+    if not repo["heads"]:
+        return JSONResponse({"message": "Git Repository is empty."}, status_code=409)
+    return {"object": {"sha": repo["heads"][branch]}}
+
+
+@app.put("/repos/{owner}/{name}/contents/{path:path}")
+async def put_contents(owner: str, name: str, path: str, request: Request):
+    body = await request.json()
+    repo = find_repo(owner, name)
+    content = base64.b64decode(body["content"]).decode()
+    sha = commit(repo, body["message"], {path: content}, [])
+    return JSONResponse({"commit": {"sha": sha}}, status_code=201)
+
+
+@app.get("/repos/{owner}/{name}/git/commits/{sha}")
+def get_commit(owner: str, name: str, sha: str):
+    return {"tree": {"sha": state["objects"][sha]["tree"]}}
+
+
+@app.post("/repos/{owner}/{name}/git/trees")
+async def create_tree(owner: str, name: str, request: Request):
+    body = await request.json()
+    files = dict(state["objects"].get(body.get("base_tree"), {}))
+    files.update({entry["path"]: entry["content"] for entry in body["tree"]})
+    return JSONResponse({"sha": store(files)}, status_code=201)
+
+
+@app.post("/repos/{owner}/{name}/git/commits")
+async def create_commit(owner: str, name: str, request: Request):
+    body = await request.json()
+    data = {k: body[k] for k in ("message", "tree", "parents")}
+    return JSONResponse({"sha": store(data)}, status_code=201)
+
+
+@app.patch("/repos/{owner}/{name}/git/refs/heads/{branch}")
+async def update_ref(owner: str, name: str, branch: str, request: Request):
+    body = await request.json()
+    find_repo(owner, name)["heads"][branch] = body["sha"]
+    return {"object": {"sha": body["sha"]}}
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m scripts.fake_github")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--secondary-limit-every", type=int, default=0)
+    parser.add_argument("--rate-limit", type=int, default=5000)
+    parser.parse_args(argv, namespace=options)
+    uvicorn.run(app, port=options.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()